@@ -1,17 +1,62 @@
-import os
-import tempfile
-import pytesseract
-# For Windows, specify the tesseract.exe path if it's not in your PATH
-# pytesseract.pytesseract.tesseract_cmd = r"C:\Program Files\Tesseract-OCR\tesseract.exe"
-from PIL import Image
-from fastapi import FastAPI, UploadFile, File
+import asyncio
+import hmac
+import json
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, UploadFile, File, HTTPException, Request, Header, Depends
 from fastapi.middleware.cors import CORSMiddleware
-from .schemas import PredictRequest, PredictResponse, ExtractedTextResponse
+from fastapi.responses import JSONResponse, StreamingResponse, PlainTextResponse, Response
+try:
+    # orjson is optional; it serializes large span lists several times faster
+    import orjson
+    from fastapi.responses import ORJSONResponse as FastJSONResponse
+except ImportError:
+    orjson = None
+    FastJSONResponse = JSONResponse
+from .schemas import (PredictRequest, PredictResponse, PredictBatchRequest,
+                      PredictBatchResponse, ExtractedTextResponse, OCRPredictResponse,
+                      RedactRequest, RedactResponse, UnredactRequest, UnredactResponse,
+                      CanaryRequest)
 from .inference import PIIModel
+from .batching import MicroBatcher
+from .cache import split_segments, group_segments
+from .spans import columnar
+from .ocr import (load_pages, ocr_page, ocr_words, PageLayout, redact_pages,
+                  page_digest, OCRCache)
+from .workers import WorkerPool
+from .redaction import placeholder_keys, redact_text, unredact_text
+from .vault import PlaceholderVault
+from .registry import ModelRegistry
+from . import config, metrics
 
 
+# Models load in the background once the server is up; /ready reports
+# when they are done, and requests arriving earlier wait for them. With a
+# registry, the worker pool starts on its active version. Hot reload swaps
+# the model the thread pool shares; a process pool would need the registry
+# (and its lock) pickled into every worker, and keeps copies it cannot swap.
+if config.REGISTRY_DIR and config.EXECUTOR != "thread":
+    raise RuntimeError("PII_REGISTRY_DIR needs PII_EXECUTOR=thread (hot reload swaps the model of one process)")
+registry = ModelRegistry(config.REGISTRY_DIR, PIIModel) if config.REGISTRY_DIR else None
+pool = WorkerPool(kind=config.EXECUTOR, workers=config.WORKERS,
+                  torch_threads=config.TORCH_THREADS, max_pending=config.MAX_PENDING,
+                  model_factory=registry.initial if registry is not None else PIIModel)
+ocr_pool = WorkerPool(kind=config.OCR_EXECUTOR, workers=config.OCR_WORKERS,
+                      torch_threads=1, max_pending=config.MAX_PENDING, name="ocr")
+vault = PlaceholderVault(config.VAULT_MAX_ENTRIES, config.VAULT_TTL_SECONDS, config.VAULT_PATH)
+ocr_cache = OCRCache(config.OCR_CACHE_ENTRIES) if config.OCR_CACHE_ENTRIES > 0 else None
 
-app = FastAPI(title="PII Detector")
+
+@asynccontextmanager
+async def lifespan(app):
+    pool.start()
+    yield
+    pool.shutdown(wait=False)
+    ocr_pool.shutdown(wait=False)
+
+
+app = FastAPI(title="PII Detector", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -21,36 +66,351 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Load model once at startup
-model = PIIModel()
+
+async def time_requests(request: Request, call_next):
+    t0 = time.perf_counter()
+    response = await call_next(request)
+    route = request.scope.get("route")
+    metrics.REQUEST_SECONDS.observe(time.perf_counter() - t0, route.path if route else "other")
+    return response
+
+
+if metrics.REGISTRY.enabled:
+    app.middleware("http")(time_requests)
+
+
+async def run_predict_batch(texts, labels=None, detectors=None, cascade=False, output="grouped",
+                            version=None):
+    """``version`` is a registry version (a canary); None is the active model."""
+    args = (texts, labels, detectors, cascade, output)
+    await asyncio.shield(pool.start())
+    if version is None:
+        metrics.MODEL_TEXTS.inc(registry.active if registry is not None else "default", amount=len(texts))
+        return await pool.call_model("predict_batch", *args)
+    metrics.MODEL_TEXTS.inc(version, amount=len(texts))
+    return await pool.run(registry.get(version).predict_batch, *args)
+
+
+async def call_version(version, method, *args):
+    """Call ``method`` on the model of registry ``version``; None is the
+    active model."""
+    if version is None:
+        return await pool.call_model(method, *args)
+    await asyncio.shield(pool.start())
+    return await pool.run(getattr(registry.get(version), method), *args)
+
+
+# Labels each model version can produce, looked up once per version
+known_labels = {}
+
+
+async def checked_options(req, version=None):
+    """``req.options()``, or a 422 if it asks for a label that no detector
+    of the model can produce."""
+    options = req.options()
+    if options[0] is not None:
+        await asyncio.shield(pool.start())
+        name = version or (registry.active if registry is not None else "default")
+        if name not in known_labels:
+            if registry is not None:
+                known_labels[name] = await pool.run(registry.get(name).known_labels)
+            else:
+                known_labels[name] = await pool.call_model("known_labels")
+        unknown = set(options[0]) - known_labels[name]
+        if unknown:
+            raise HTTPException(status_code=422, detail=f"Unknown labels: {', '.join(sorted(unknown))}")
+    return options
+
+
+# One batcher per combination of request options (labels, detectors,
+# cascade, format) and model version, so that every batch runs with a
+# single set of options on one model. The least recently used are
+# dropped past BATCHERS_KEPT; a dropped batcher still answers the texts
+# it holds, and its worker stops once it is idle.
+BATCHERS_KEPT = 64
+batchers = OrderedDict()
+
+
+def batcher_for(options, version=None):
+    key = (options, version)
+    if key in batchers:
+        batchers.move_to_end(key)
+        return batchers[key]
+    batchers[key] = MicroBatcher(lambda texts: run_predict_batch(texts, *options, version=version),
+                                 max_wait_ms=config.BATCH_MAX_WAIT_MS,
+                                 max_batch_size=config.BATCH_MAX_SIZE,
+                                 max_in_flight=config.WORKERS)
+    if len(batchers) > BATCHERS_KEPT:
+        batchers.popitem(last=False)
+    return batchers[key]
+
+
+def route():
+    return registry.route() if registry is not None else None
 
 
 @app.post("/predict", response_model=PredictResponse)
 async def predict(req: PredictRequest):
     text = req.text
-    pii_entities = model.predict(text)
-    return PredictResponse(pii=pii_entities)
+    version = route()
+    pii_entities = await batcher_for(await checked_options(req, version), version).submit(text)
+    # Built by the pipeline, so skip re-validating it through PredictResponse
+    return FastJSONResponse({"pii": pii_entities})
+
+
+@app.post("/predict_batch", response_model=PredictBatchResponse)
+async def predict_batch(req: PredictBatchRequest):
+    # One version for the whole request, so its results do not mix models
+    results, version = [], route()
+    options = await checked_options(req, version)
+    for i in range(0, len(req.texts), config.BATCH_MAX_SIZE):
+        results += await run_predict_batch(req.texts[i:i + config.BATCH_MAX_SIZE], *options,
+                                           version=version)
+    return FastJSONResponse({"results": results})
+
+
+# -------------------------------
+# Redaction
+# -------------------------------
+@app.post("/redact", response_model=RedactResponse)
+async def redact(req: RedactRequest):
+    version = route()
+    pii = await batcher_for(await checked_options(req, version), version).submit(req.text)
+    keys = placeholder_keys(pii)
+    for entity, key in zip(pii, keys):
+        entity["key"] = key
+    token = vault.put({key: entity["word"] for entity, key in zip(pii, keys)})
+    return RedactResponse(redacted_text=redact_text(req.text, pii, keys), token=token, pii=pii)
+
+
+@app.post("/unredact", response_model=UnredactResponse)
+async def unredact(req: UnredactRequest):
+    found = vault.get(req.token)
+    if found is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired token")
+    mapping, pattern = found
+    return UnredactResponse(text=unredact_text(req.text, mapping, pattern))
+
+
+# -------------------------------
+# Streaming predictions
+# -------------------------------
+def _event(event, **fields):
+    if orjson is not None:
+        return orjson.dumps({"event": event, **fields}) + b"\n"
+    return json.dumps({"event": event, **fields}) + "\n"
+
+
+async def stream_predictions(text, labels=None, detectors=None, cascade=False, output="grouped",
+                             version=None):
+    """NDJSON events: the regex hits first (and the gazetteer's, when one is
+    configured), then each model's spans for one group of paragraphs at a
+    time as they finish, then the merged result.
+    The models see one paragraph at a time, as in predict(), so the final
+    event matches what /predict returns for the same text and options.
+    Detectors that do not run send no events. ``version`` is as for
+    run_predict_batch."""
+    run, methods, allowed = await call_version(version, "stream_plan", labels, detectors)
+    metrics.MODEL_TEXTS.inc(version or (registry.active if registry is not None else "default"))
+
+    def keep(spans):
+        return [s for s in spans if s.label in allowed]
+
+    regex = []
+    if "regex" in run or cascade:
+        # The cascade signal always uses every regex rule
+        hits = await asyncio.to_thread(PIIModel.SCANNER.scan, text)
+    if "regex" in run:
+        regex = keep(hits)
+        yield _event("regex", spans=[s.to_dict() for s in regex])
+    listed = []
+    if config.GAZETTEER_PATH and "gazetteer" in run:
+        listed = keep((await call_version(version, "gazetteer_spans_batch", [text]))[0])
+        yield _event("gazetteer", spans=[s.to_dict() for s in listed])
+
+    segments = split_segments(text)
+    if cascade:
+        segments = [(offset + o, segment) for offset, piece in PIIModel.cascade_pieces(text, hits)
+                    for o, segment in split_segments(piece)]
+    groups = group_segments(segments, config.STREAM_CHUNK_CHARS) if methods else []
+    found = []
+    for n, group in enumerate(groups):
+        segments = [segment for _, segment in group]
+        jobs = {asyncio.ensure_future(call_version(version, method, segments)): stage
+                for stage, method in methods.items()}
+        per_stage = {}
+        pending = set(jobs)
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for job in done:
+                stage = jobs[job]
+                per_stage[stage] = [[s.shifted(offset, text) for s in keep(spans)]
+                                    for (offset, _), spans in zip(group, job.result())]
+                yield _event(stage, chunk=n, chunks=len(groups),
+                             spans=[s.to_dict() for spans in per_stage[stage] for s in spans])
+        for per_segment in zip(*(per_stage[stage] for stage in methods)):
+            found += [s for spans in per_segment for s in spans]
+
+    merged = PIIModel.merge_spans(regex + listed + found)
+    yield _event("final", pii=columnar(merged) if output == "columnar" else PIIModel.group_spans(merged))
+
+
+@app.post("/predict/stream")
+async def predict_stream(req: PredictRequest):
+    version = route()
+    options = await checked_options(req, version)
+    return StreamingResponse(stream_predictions(req.text, *options, version=version),
+                             media_type="application/x-ndjson")
 
 
 @app.get("/")
 async def root():
     return {"message": "PII Phone Detector API is running"}
 
-@app.post("/ocr", response_model=ExtractedTextResponse)
-async def ocr_predict(file: UploadFile = File(...)):
-    # Get a safe temp path
-    temp_dir = tempfile.gettempdir()
-    temp_path = os.path.join(temp_dir, file.filename)
 
-    with open(temp_path, "wb") as f:
-        f.write(await file.read())
+@app.get("/ready")
+async def ready():
+    status = await pool.status()
+    return JSONResponse(status, status_code=200 if status["ready"] else 503)
+
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    if not metrics.REGISTRY.enabled:
+        return Response(status_code=404)
+    return PlainTextResponse(metrics.REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/cache")
+async def cache_stats():
+    # In process mode this reports the cache of whichever worker answers
+    return await pool.call_model("cache_stats")
+
+
+# -------------------------------
+# Model registry (admin)
+# -------------------------------
+def require_admin(x_admin_token: str = Header(None)):
+    if config.ADMIN_TOKEN is not None and not hmac.compare_digest(x_admin_token or "", config.ADMIN_TOKEN):
+        raise HTTPException(status_code=401, detail="Missing or wrong X-Admin-Token")
+    if registry is None:
+        raise HTTPException(status_code=404, detail="No model registry; set PII_REGISTRY_DIR")
+
+
+# Background loads, kept so they are not garbage collected while running
+loads = {}
+
+
+@app.get("/admin/models", dependencies=[Depends(require_admin)])
+async def registry_status():
+    return registry.status()
 
-    image = Image.open(temp_path)
-    extracted_text = pytesseract.image_to_string(image, lang="eng")
-    print("=== OCR OUTPUT START ===")
-    print(extracted_text)
-    print("=== OCR OUTPUT END ===")
 
+@app.post("/admin/models/{version}/load", dependencies=[Depends(require_admin)])
+async def load_version(version: str):
+    """Load and warm up ``version`` in the background; poll /admin/models
+    until it shows up under "loaded"."""
+    try:
+        registry.check(version)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e.args[0]))
+    await asyncio.shield(pool.start())
+    if version in registry.models:
+        return JSONResponse({"version": version, "state": "loaded"})
+    if version not in loads:
+        def done(job):
+            loads.pop(version, None)
+            if not job.cancelled() and job.exception() is not None:
+                print(f"⚠️ Could not load model version {version}: {job.exception()}")
+        loads[version] = asyncio.ensure_future(asyncio.to_thread(registry.load, version))
+        loads[version].add_done_callback(done)
+    return JSONResponse({"version": version, "state": "loading"}, status_code=202)
+
+
+@app.post("/admin/models/{version}/activate", dependencies=[Depends(require_admin)])
+async def activate_version(version: str):
+    try:
+        # Swapping the reference is atomic; running batches finish on the old model
+        pool.model = registry.activate(version)
+    except LookupError as e:
+        raise HTTPException(status_code=409, detail=str(e.args[0]))
+    return registry.status()
+
+
+@app.post("/admin/models/rollback", dependencies=[Depends(require_admin)])
+async def rollback_version():
+    try:
+        pool.model = registry.rollback()
+    except LookupError as e:
+        raise HTTPException(status_code=409, detail=str(e.args[0]))
+    return registry.status()
+
+
+@app.post("/admin/models/canary", dependencies=[Depends(require_admin)])
+async def set_canary(req: CanaryRequest):
+    try:
+        registry.set_canary(req.version, req.percent)
+    except LookupError as e:
+        raise HTTPException(status_code=409, detail=str(e.args[0]))
+    return registry.status()
+
+# -------------------------------
+# OCR
+# -------------------------------
+def decode_upload(data):
+    with metrics.STAGE_SECONDS.time("ocr_decode"):
+        pages = load_pages(data, dpi=config.OCR_PDF_DPI, max_pages=config.OCR_MAX_PAGES)
+    keys = [page_digest(page) if ocr_cache is not None else None for page in pages]
+    return pages, keys
+
+
+async def read_upload(file):
+    data = await file.read()
+    try:
+        return await asyncio.to_thread(decode_upload, data)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ImportError as e:
+        raise HTTPException(status_code=415, detail=str(e))
+
+
+async def ocr_all(fn, pages, keys):
+    """Run ``fn`` (ocr_page or ocr_words) over every page concurrently,
+    reusing cached results for pages seen before."""
+    async def one(page, key):
+        key = (fn.__name__, key) if key is not None else None
+        result = ocr_cache.get(key) if key is not None else None
+        metrics.OCR_PAGES.inc("hit" if result is not None else "miss")
+        if result is None:
+            result = await ocr_pool.run(fn, page, config.OCR_LANG,
+                                        config.OCR_MAX_SIDE, config.OCR_BINARIZE)
+            if key is not None:
+                ocr_cache.put(key, result)
+        return result
+    return await asyncio.gather(*(one(page, key) for page, key in zip(pages, keys)))
+
+
+@app.post("/ocr", response_model=ExtractedTextResponse)
+async def ocr_predict(file: UploadFile = File(...)):
+    # Pages come back in order, joined by newlines
+    pages, keys = await read_upload(file)
+    extracted_text = "\n".join(await ocr_all(ocr_page, pages, keys))
     return ExtractedTextResponse(
         extracted_text=extracted_text)
 
+
+@app.post("/ocr/predict", response_model=OCRPredictResponse)
+async def ocr_detect(file: UploadFile = File(...), redact: bool = False):
+    """OCR with word boxes, then PII detection on the text in the same call.
+    Each entity gets ``boxes`` (page pixel rectangles for its positions);
+    with ``?redact=true`` the pages come back blacked out as base64 PNGs."""
+    pages, keys = await read_upload(file)
+    layout = PageLayout(await ocr_all(ocr_words, pages, keys))
+    pii = await batcher_for((None, None, False, "grouped"), route()).submit(layout.text)
+    for entity in pii:
+        entity["boxes"] = [box for start, end in entity["position"] for box in layout.boxes(start, end)]
+    redacted = None
+    if redact:
+        boxes = [box for entity in pii for box in entity["boxes"]]
+        redacted = await asyncio.to_thread(redact_pages, pages, boxes)
+    return OCRPredictResponse(extracted_text=layout.text, pii=pii, redacted_pages=redacted)
@@ -0,0 +1,93 @@
+import asyncio
+
+from . import metrics
+
+
+class MicroBatcher:
+    """Coalesces concurrent single-text predictions into batched calls.
+
+    The first text to arrive opens a batch; it is flushed once it holds
+    ``max_batch_size`` texts or ``max_wait_ms`` has passed, and every caller
+    gets back its own slice of the result of ``run_batch``, a coroutine
+    function taking the list of texts. Up to ``max_in_flight`` batches run
+    at the same time, typically one per inference worker. The task
+    collecting batches stops after ``idle_seconds`` without a text and is
+    started again by the next one.
+    """
+
+    def __init__(self, run_batch, max_wait_ms=5.0, max_batch_size=16, max_in_flight=1,
+                 idle_seconds=60.0):
+        self.run_batch = run_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_in_flight = max(1, int(max_in_flight))
+        self.idle_seconds = idle_seconds
+        self._loop = None
+        self._queue = None
+        self._worker = None
+        # Batches being run; the loop only keeps weak references to tasks
+        self._flushes = set()
+
+    async def submit(self, text):
+        loop = asyncio.get_running_loop()
+        if self._worker is None or self._worker.done():
+            # After an idle stop the queue and the slots held by batches
+            # still running carry over; a new loop or a dead worker resets them
+            if self._loop is not loop or self._worker is not None:
+                self._queue = asyncio.Queue()
+                self._slots = asyncio.Semaphore(self.max_in_flight)
+                self._loop = loop
+            self._worker = loop.create_task(self._run())
+        fut = loop.create_future()
+        self._queue.put_nowait((text, fut, loop.time()))
+        return await fut
+
+    async def _collect(self, first):
+        loop = asyncio.get_running_loop()
+        batch = [first]
+        deadline = loop.time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await self._slots.acquire()
+            try:
+                first = await asyncio.wait_for(self._queue.get(), self.idle_seconds)
+            except asyncio.TimeoutError:
+                self._slots.release()
+                if self._queue.empty():
+                    self._worker = None
+                    return
+                continue
+            batch = await self._collect(first)
+            task = loop.create_task(self._flush(batch))
+            self._flushes.add(task)
+            task.add_done_callback(self._flushes.discard)
+
+    async def _flush(self, batch):
+        now = asyncio.get_running_loop().time()
+        for _, _, queued in batch:
+            metrics.QUEUE_SECONDS.observe(now - queued, "batcher")
+        texts = [text for text, _, _ in batch]
+        try:
+            results = await self.run_batch(texts)
+        except Exception as e:
+            for _, fut, _ in batch:
+                if not fut.done(): fut.set_exception(e)
+            return
+        finally:
+            self._slots.release()
+        for (_, fut, _), result in zip(batch, results):
+            if not fut.done(): fut.set_result(result)
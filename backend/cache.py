@@ -0,0 +1,156 @@
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+from collections import OrderedDict
+
+from .spans import Span
+
+PARAGRAPH_BREAK = re.compile(r"\n[ \t\r\f\v]*\n\s*")
+
+
+def split_segments(text):
+    """Split ``text`` into paragraphs. Returns ``(offset, segment)`` pairs for
+    every non-blank paragraph, where ``offset`` is its position in ``text``."""
+    segments, pos = [], 0
+    for m in PARAGRAPH_BREAK.finditer(text):
+        if text[pos:m.start()].strip():
+            segments.append((pos, text[pos:m.start()]))
+        pos = m.end()
+    if text[pos:].strip():
+        segments.append((pos, text[pos:]))
+    return segments
+
+
+def group_segments(segments, max_chars):
+    """Pack consecutive ``(offset, segment)`` pairs into groups of at most
+    ``max_chars`` characters (a longer paragraph gets a group of its own)."""
+    groups, size = [], 0
+    for offset, segment in segments:
+        if not groups or size + len(segment) > max_chars:
+            groups.append([])
+            size = 0
+        groups[-1].append((offset, segment))
+        size += len(segment)
+    return groups
+
+
+class SpanCache:
+    """Content-addressed cache of model spans, keyed by a hash of the segment.
+
+    Entries are tuples of ``(start, end, label, score)`` relative to the
+    segment. The in-memory tier holds at most ``max_entries`` segments and
+    evicts the least recently used; with ``path`` set, entries are also
+    written to a SQLite file that survives restarts and refills the memory
+    tier on a miss.
+    """
+
+    def __init__(self, max_entries=10000, path=None, namespace=""):
+        self.max_entries = max(1, int(max_entries))
+        self.namespace = namespace
+        self.hits = self.misses = self.disk_hits = 0
+        self._mem = OrderedDict()
+        self.path = path
+        self._connect()
+
+    def _connect(self):
+        self._lock = threading.Lock()
+        self._db = None
+        if self.path:
+            self._db = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+            self._db.execute("CREATE TABLE IF NOT EXISTS spans (key TEXT PRIMARY KEY, spans TEXT)")
+            self._db.commit()
+
+    def after_fork(self):
+        """A forked child must not share the parent's SQLite connection."""
+        self._connect()
+
+    def key(self, segment):
+        data = f"{self.namespace}\0{segment}".encode("utf-8", "surrogatepass")
+        return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+    def _remember(self, key, spans):
+        self._mem[key] = spans
+        self._mem.move_to_end(key)
+        while len(self._mem) > self.max_entries:
+            self._mem.popitem(last=False)
+
+    def get(self, key):
+        with self._lock:
+            spans = self._mem.get(key)
+            if spans is not None:
+                self._mem.move_to_end(key)
+                self.hits += 1
+                return spans
+            if self._db is not None:
+                row = self._db.execute("SELECT spans FROM spans WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    spans = [tuple(s) for s in json.loads(row[0])]
+                    self._remember(key, spans)
+                    self.hits += 1
+                    self.disk_hits += 1
+                    return spans
+            self.misses += 1
+            return None
+
+    def put_many(self, items):
+        with self._lock:
+            for key, spans in items:
+                self._remember(key, spans)
+            if self._db is not None:
+                self._db.executemany("INSERT OR REPLACE INTO spans VALUES (?, ?)",
+                                     [(key, json.dumps(spans)) for key, spans in items])
+                self._db.commit()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {"entries": len(self._mem), "max_entries": self.max_entries,
+                    "hits": self.hits, "misses": self.misses, "disk_hits": self.disk_hits,
+                    "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                    "disk": self._db is not None}
+
+
+class SegmentPlan:
+    """Looks up every paragraph of ``texts`` in ``cache`` (if any). ``missing``
+    lists the distinct segments that still have to go through the models;
+    once their spans are known, ``resolve`` stores them (unless ``store``
+    is false) and returns spans for the full texts, shifted into place."""
+
+    def __init__(self, texts, cache):
+        self.texts = texts
+        self.cache = cache
+        self.parts = []
+        self.found = {}
+        self.missing, self.missing_keys, pending = [], [], set()
+        for text in texts:
+            parts = []
+            for offset, segment in split_segments(text):
+                key = cache.key(segment) if cache is not None else segment
+                if key not in self.found and key not in pending:
+                    spans = cache.get(key) if cache is not None else None
+                    if spans is None:
+                        self.missing.append(segment)
+                        self.missing_keys.append(key)
+                        pending.add(key)
+                    else:
+                        self.found[key] = spans
+                parts.append((offset, key))
+            self.parts.append(parts)
+
+    def resolve(self, computed, store=True):
+        fresh = [(key, [(s.start, s.end, s.label, s.score) for s in spans])
+                 for key, spans in zip(self.missing_keys, computed)]
+        if fresh and store and self.cache is not None:
+            self.cache.put_many(fresh)
+        self.found.update(fresh)
+
+        out = []
+        for text, parts in zip(self.texts, self.parts):
+            spans = []
+            for offset, key in parts:
+                for st, en, label, score in self.found[key]:
+                    spans.append(Span(offset + st, offset + en, label, score, text))
+            out.append(spans)
+        return out
@@ -0,0 +1,146 @@
+import os
+
+# -------------------------------
+# Helpers
+# -------------------------------
+def _env_int(name, default):
+    value = os.environ.get(name)
+    return int(value) if value not in (None, "") else default
+
+
+def _env_float(name, default):
+    value = os.environ.get(name)
+    return float(value) if value not in (None, "") else default
+
+
+# -------------------------------
+# Request batching
+# -------------------------------
+# How long the first request of a batch waits for company, and how many
+# texts go into one forward pass at most.
+BATCH_MAX_WAIT_MS = _env_float("PII_BATCH_MAX_WAIT_MS", 5.0)
+BATCH_MAX_SIZE = _env_int("PII_BATCH_MAX_SIZE", 16)
+
+# -------------------------------
+# Worker pools
+# -------------------------------
+# "thread" shares one model between PII_WORKERS threads; "process" loads
+# one model per worker process. PII_TORCH_THREADS=0 splits the cores evenly
+# between the workers.
+EXECUTOR = os.environ.get("PII_EXECUTOR", "thread")
+WORKERS = _env_int("PII_WORKERS", 1)
+TORCH_THREADS = _env_int("PII_TORCH_THREADS", 0)
+MAX_PENDING = _env_int("PII_MAX_PENDING", 64)
+OCR_WORKERS = _env_int("PII_OCR_WORKERS", 2)
+
+# -------------------------------
+# Long documents
+# -------------------------------
+# Texts longer than a model's context are scanned in overlapping token
+# windows (PII_CHUNK_STRIDE tokens of overlap) instead of being truncated;
+# PII_CHUNK_BATCH_SIZE windows go through the model per forward pass.
+CHUNKING = os.environ.get("PII_CHUNKING", "1") != "0"
+CHUNK_STRIDE = _env_int("PII_CHUNK_STRIDE", 128)
+CHUNK_BATCH_SIZE = _env_int("PII_CHUNK_BATCH_SIZE", 16)
+
+# -------------------------------
+# Detector pipeline
+# -------------------------------
+# Run the regex scan and both transformer passes concurrently within one
+# request. Lowers single-request latency; leave off when PII_WORKERS already
+# keeps every core busy.
+PARALLEL_DETECTORS = os.environ.get("PII_PARALLEL_DETECTORS", "0") == "1"
+
+# -------------------------------
+# Gazetteer
+# -------------------------------
+# Index of organisation-specific deny-lists (employee names, account numbers,
+# project codes, ...) built with python -m backend.gazetteer. It is
+# memory-mapped, so worker processes share one copy of it.
+GAZETTEER_PATH = os.environ.get("PII_GAZETTEER_PATH") or None
+
+# -------------------------------
+# Result cache
+# -------------------------------
+# Model spans are cached per paragraph; PII_CACHE_MAX_ENTRIES=0 disables the
+# cache. Set PII_CACHE_PATH to a SQLite file to keep entries across restarts.
+CACHE_MAX_ENTRIES = _env_int("PII_CACHE_MAX_ENTRIES", 10000)
+CACHE_PATH = os.environ.get("PII_CACHE_PATH") or None
+
+# -------------------------------
+# Inference engine
+# -------------------------------
+# torch (eager fp32), torch-int8 (dynamic quantization), onnx or onnx-int8
+# (ONNX Runtime; models are exported to PII_ONNX_DIR on first use).
+ENGINE = os.environ.get("PII_ENGINE", "torch")
+ONNX_DIR = os.environ.get("PII_ONNX_DIR", os.path.join(os.path.dirname(__file__), "onnx"))
+
+# -------------------------------
+# Model loading
+# -------------------------------
+# Models are read from pinned copies in PII_MODEL_DIR (fetched once with
+# python -m backend.fetch_models). PII_OFFLINE=1 refuses to fall back to
+# the Hugging Face Hub; PII_LAZY_MODELS=1 loads each model on first use
+# instead of at startup, where PII_WARMUP_RUNS passes are run otherwise.
+NER_MODEL = os.environ.get("PII_NER_MODEL", "dslim/bert-base-NER")
+NER_REVISION = os.environ.get("PII_NER_REVISION", "main")
+DISTIL_MODEL = os.environ.get("PII_DISTIL_MODEL", "andrew2504/finetuned_redact_model")
+DISTIL_REVISION = os.environ.get("PII_DISTIL_REVISION", "main")
+# A single student model trained on both label sets (a directory or Hub id,
+# see train_student_model.py) replaces the two models above when set.
+STUDENT_MODEL = os.environ.get("PII_STUDENT_MODEL") or None
+MODEL_DIR = os.environ.get("PII_MODEL_DIR", os.path.join(os.path.dirname(__file__), "models"))
+OFFLINE = os.environ.get("PII_OFFLINE", "0") == "1"
+LAZY_MODELS = os.environ.get("PII_LAZY_MODELS", "0") == "1"
+WARMUP_RUNS = _env_int("PII_WARMUP_RUNS", 1)
+
+# -------------------------------
+# Streaming
+# -------------------------------
+# /predict/stream sends model spans for about this many characters of
+# paragraphs at a time.
+STREAM_CHUNK_CHARS = _env_int("PII_STREAM_CHUNK_CHARS", 2000)
+
+# -------------------------------
+# OCR
+# -------------------------------
+# Pages of an upload are OCR'd in parallel on PII_OCR_WORKERS workers;
+# Tesseract runs as a subprocess, so threads already use several cores.
+# PII_OCR_MAX_SIDE (pixels, 0 = off) and PII_OCR_BINARIZE=1 shrink and
+# threshold pages first. Pages seen before (identical pixels) are served
+# from a cache of PII_OCR_CACHE_ENTRIES pages (0 disables it).
+OCR_EXECUTOR = os.environ.get("PII_OCR_EXECUTOR", "thread")
+OCR_LANG = os.environ.get("PII_OCR_LANG", "eng")
+OCR_MAX_PAGES = _env_int("PII_OCR_MAX_PAGES", 100)
+OCR_PDF_DPI = _env_int("PII_OCR_PDF_DPI", 300)
+OCR_MAX_SIDE = _env_int("PII_OCR_MAX_SIDE", 0)
+OCR_BINARIZE = os.environ.get("PII_OCR_BINARIZE", "0") == "1"
+OCR_CACHE_ENTRIES = _env_int("PII_OCR_CACHE_ENTRIES", 256)
+
+# -------------------------------
+# Metrics
+# -------------------------------
+# Stage timings, sizes and counts exported at /metrics; PII_METRICS=0 turns
+# recording off entirely.
+METRICS = os.environ.get("PII_METRICS", "1") != "0"
+
+# -------------------------------
+# Redaction vault
+# -------------------------------
+# /redact keeps each placeholder map for PII_VAULT_TTL_SECONDS so /unredact
+# can restore the text; at most PII_VAULT_MAX_ENTRIES maps are kept (LRU).
+# Set PII_VAULT_PATH to a SQLite file to share the maps between worker
+# processes and keep them across restarts.
+VAULT_MAX_ENTRIES = _env_int("PII_VAULT_MAX_ENTRIES", 10000)
+VAULT_TTL_SECONDS = _env_float("PII_VAULT_TTL_SECONDS", 3600.0)
+VAULT_PATH = os.environ.get("PII_VAULT_PATH") or None
+
+# -------------------------------
+# Model registry
+# -------------------------------
+# Versions of the fine-tuned model (or of the student) as directories under
+# PII_REGISTRY_DIR; the /admin/models endpoints load, activate, roll back and
+# canary them without a restart. Those endpoints require the X-Admin-Token
+# header to equal PII_ADMIN_TOKEN when it is set.
+REGISTRY_DIR = os.environ.get("PII_REGISTRY_DIR") or None
+ADMIN_TOKEN = os.environ.get("PII_ADMIN_TOKEN") or None
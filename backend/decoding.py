@@ -0,0 +1,61 @@
+import torch
+
+from .spans import Span
+
+
+class BIODecoder:
+    """Turns token-classification probabilities into character spans.
+
+    Works on a whole (rows x tokens x labels) batch at once: argmax/max run
+    once over the tensor, and span boundaries are found with array ops on
+    the flattened sequence of real tokens (special and padding tokens have
+    an end offset of 0 and are dropped, as before). Python only touches
+    finished spans, so each span's ``word`` is sliced exactly once.
+
+    A span starts at a confident non-"O" token that is a ``B-`` tag, follows
+    a dropped token, changes entity type, or starts a new row; it extends
+    over the following confident tokens of the same type.
+    """
+
+    def __init__(self, id2label):
+        labels = [id2label[i] for i in range(len(id2label))]
+        prefixes, ents = zip(*[(label.split("-") + [""])[:2] for label in labels])
+        self.ent_names = sorted(set(ents))
+        ent_index = {e: i for i, e in enumerate(self.ent_names)}
+        self.is_begin = torch.tensor([p == "B" for p in prefixes])
+        self.is_outside = torch.tensor([label == "O" for label in labels])
+        self.ent_id = torch.tensor([ent_index[e] for e in ents])
+
+    def decode(self, texts, probs, offsets, threshold=0.8):
+        """``texts[r]`` is the text of row ``r``; ``offsets`` is the
+        (rows x tokens x 2) offset mapping. Returns one span list per row."""
+        out = [[] for _ in range(probs.shape[0])]
+        scores, ids = probs.max(dim=-1)
+        row, pos = (offsets[..., 1] != 0).nonzero(as_tuple=True)
+        if row.numel() == 0:
+            return out
+        scores, ids = scores[row, pos], ids[row, pos]
+        starts, ends = offsets[row, pos, 0], offsets[row, pos, 1]
+
+        keep = (scores >= threshold) & ~self.is_outside[ids]
+        ent = self.ent_id[ids]
+        first = torch.ones_like(keep)
+        first[1:] = (~keep[:-1]) | (ent[1:] != ent[:-1]) | (row[1:] != row[:-1])
+        opens = keep & (first | self.is_begin[ids])
+
+        kept = keep.nonzero(as_tuple=True)[0]
+        if kept.numel() == 0:
+            return out
+        span_id = torch.cumsum(opens.long(), 0)[kept] - 1
+        n_spans = int(span_id[-1]) + 1
+        span_score = torch.zeros(n_spans, dtype=scores.dtype).scatter_reduce(
+            0, span_id, scores[kept], reduce="amax", include_self=False)
+        heads = opens.nonzero(as_tuple=True)[0]
+        tails = torch.zeros(n_spans, dtype=torch.long).scatter_reduce(
+            0, span_id, kept, reduce="amax", include_self=False)
+
+        for r, st, en, e, score in zip(row[heads].tolist(), starts[heads].tolist(),
+                                       ends[tails].tolist(), ent[heads].tolist(),
+                                       span_score.tolist()):
+            out[r].append(Span(st, en, self.ent_names[e], round(score, 4), texts[r]))
+        return out
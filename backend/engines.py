@@ -0,0 +1,148 @@
+import hashlib
+import inspect
+import os
+
+import torch
+
+ENGINES = ("torch", "torch-int8", "onnx", "onnx-int8")
+
+
+# -------------------------------
+# PyTorch engines
+# -------------------------------
+class TorchEngine:
+    """Eager PyTorch forward pass returning the logits tensor."""
+
+    def __init__(self, model):
+        self.model = model.eval()
+        self.config = model.config
+
+    def __call__(self, **inputs):
+        with torch.no_grad():
+            return self.model(**inputs).logits
+
+
+class TorchInt8Engine(TorchEngine):
+    """PyTorch with the Linear layers dynamically quantized to int8."""
+
+    def __init__(self, model):
+        quantized = torch.ao.quantization.quantize_dynamic(model.eval(), {torch.nn.Linear}, dtype=torch.qint8)
+        super().__init__(quantized)
+
+
+# -------------------------------
+# ONNX Runtime engines
+# -------------------------------
+def _onnxruntime():
+    try:
+        import onnxruntime
+    except ImportError as e:
+        raise ImportError("The onnx engines need onnxruntime: pip install onnxruntime") from e
+    return onnxruntime
+
+
+def weights_digest(model):
+    """Short digest of a model's weights. It goes into the names of the
+    exported files, so that a model retrained in place or pinned to another
+    revision is exported again instead of reusing the old graph."""
+    digest = hashlib.blake2b(digest_size=8)
+    with torch.no_grad():
+        for name, tensor in model.state_dict().items():
+            digest.update(name.encode("utf-8"))
+            digest.update(tensor.detach().cpu().contiguous().view(-1).view(torch.uint8).numpy())
+    return digest.hexdigest()
+
+
+def onnx_paths(onnx_dir, model_id, digest):
+    name = f"{model_id.strip('/').replace('/', '__')}.{digest}"
+    return os.path.join(onnx_dir, f"{name}.onnx"), os.path.join(onnx_dir, f"{name}.int8.onnx")
+
+
+def _write_atomically(path, write):
+    """Call ``write`` with a temporary file next to ``path`` and then move
+    it into place, so that another process (or a retry after a crash) never
+    loads a half-written model."""
+    root, ext = os.path.splitext(path)
+    tmp = f"{root}.{os.getpid()}.tmp{ext}"
+    try:
+        write(tmp)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return path
+
+
+def export_onnx(model, path):
+    """Export a token-classification model with dynamic batch and sequence axes."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    names = ["input_ids", "attention_mask"]
+    if "token_type_ids" in inspect.signature(model.forward).parameters:
+        names.append("token_type_ids")
+    dummy = tuple(torch.ones(1, 8, dtype=torch.long) for _ in names)
+    axes = {n: {0: "batch", 1: "sequence"} for n in names + ["logits"]}
+
+    class _Logits(torch.nn.Module):
+        def __init__(self, inner):
+            super().__init__()
+            self.inner = inner
+
+        def forward(self, *args):
+            return self.inner(**dict(zip(names, args))).logits
+
+    def write(tmp):
+        with torch.no_grad():
+            torch.onnx.export(_Logits(model.eval()), dummy, tmp, input_names=names,
+                              output_names=["logits"], dynamic_axes=axes, opset_version=17,
+                              dynamo=False)
+
+    return _write_atomically(path, write)
+
+
+def quantize_onnx(src, dst):
+    """Dynamic int8 quantization of an exported model's weights."""
+    _onnxruntime()
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+    return _write_atomically(dst, lambda tmp: quantize_dynamic(src, tmp, weight_type=QuantType.QInt8))
+
+
+class OnnxEngine:
+    """ONNX Runtime session over an exported model; returns torch logits so
+    the decoders work unchanged."""
+
+    def __init__(self, path, config, threads=None):
+        ort = _onnxruntime()
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        self.input_names = [i.name for i in self.session.get_inputs()]
+        self.config = config
+
+    def __call__(self, **inputs):
+        feeds = {name: inputs[name].numpy() for name in self.input_names}
+        return torch.from_numpy(self.session.run(["logits"], feeds)[0])
+
+
+# -------------------------------
+# Engine selection
+# -------------------------------
+def load_engine(kind, model_id, model, onnx_dir, threads=None):
+    """Wrap ``model`` (an eager HF model) in the engine named ``kind``. ONNX
+    files are read from ``onnx_dir`` and exported there on first use."""
+    if kind == "torch":
+        return TorchEngine(model)
+    if kind == "torch-int8":
+        return TorchInt8Engine(model)
+    if kind in ("onnx", "onnx-int8"):
+        fp32_path, int8_path = onnx_paths(onnx_dir, model_id, weights_digest(model))
+        if not os.path.exists(fp32_path):
+            export_onnx(model, fp32_path)
+        path = fp32_path
+        if kind == "onnx-int8":
+            if not os.path.exists(int8_path):
+                quantize_onnx(fp32_path, int8_path)
+            path = int8_path
+        return OnnxEngine(path, model.config, threads)
+    raise ValueError(f"Unknown inference engine {kind!r}; expected one of {', '.join(ENGINES)}")
@@ -0,0 +1,85 @@
+import argparse
+import os
+import time
+
+import pandas as pd
+
+from .inference import PIIModel
+from . import config
+
+# -------------------------------
+# Config
+# -------------------------------
+DATA_DIR = os.path.join(os.path.dirname(__file__), "..", "data")
+SAMPLE_TEXTS = [
+    "This agreement is entered into on 15 August 2025 between StarForge Entertainment Pte Ltd and Kim Han.",
+    "Lee Min lives at #03-06 602 Bukit Batok East Green Singapore 603673 and paid USD 250,000.",
+    "Please transfer 1893 dollars to account 6312788358 before 20 September 2025.",
+]
+
+
+# -------------------------------
+# Parity check
+# -------------------------------
+def load_texts(data_dir, limit):
+    texts = list(SAMPLE_TEXTS)
+    for file in sorted(os.listdir(data_dir)):
+        if file.endswith(".csv"):
+            texts += pd.read_csv(os.path.join(data_dir, file))["text"].head(limit).tolist()
+    return texts
+
+
+def model_spans(model, texts):
+    ml = model.ml_spans_batch(texts)
+    distil = model.distil_spans_batch(texts)
+    return [{(s.start, s.end, s.label): s.score for s in m + d} for m, d in zip(ml, distil)]
+
+
+def compare(reference, candidate, score_tol):
+    """Span-level agreement between two engines: the fraction of spans found
+    by both, and how many of those shared spans differ in score by more
+    than ``score_tol``."""
+    shared = total = off = 0
+    for ref, cand in zip(reference, candidate):
+        keys = ref.keys() & cand.keys()
+        shared += len(keys)
+        total += len(ref.keys() | cand.keys())
+        off += sum(abs(ref[k] - cand[k]) > score_tol for k in keys)
+    return (shared / total if total else 1.0), off
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Export the NER models to ONNX and check span parity with fp32 PyTorch.")
+    ap.add_argument("--engines", nargs="+", default=["onnx", "onnx-int8"])
+    ap.add_argument("--onnx-dir", default=config.ONNX_DIR)
+    ap.add_argument("--limit", type=int, default=50, help="texts per CSV in data/")
+    ap.add_argument("--min-agreement", type=float, default=0.95)
+    ap.add_argument("--score-tol", type=float, default=0.05)
+    ap.add_argument("--max-off", type=int, default=0,
+                    help="shared spans allowed to differ in score by more than --score-tol")
+    args = ap.parse_args()
+
+    texts = load_texts(DATA_DIR, args.limit)
+    # Caching would hide the engines' own outputs
+    reference_model = PIIModel(engine="torch", cache_entries=0)
+    t0 = time.perf_counter()
+    reference = model_spans(reference_model, texts)
+    print(f"torch        {time.perf_counter() - t0:7.2f}s  (reference, {len(texts)} texts)")
+
+    failed = False
+    for engine in args.engines:
+        model = PIIModel(engine=engine, onnx_dir=args.onnx_dir, cache_entries=0)
+        t0 = time.perf_counter()
+        spans = model_spans(model, texts)
+        elapsed = time.perf_counter() - t0
+        agreement, off = compare(reference, spans, args.score_tol)
+        ok = agreement >= args.min_agreement and off <= args.max_off
+        failed |= not ok
+        print(f"{engine:<12} {elapsed:7.2f}s  span agreement {agreement:.3f}, "
+              f"{off} shared spans off by > {args.score_tol}  {'OK' if ok else 'FAIL'}")
+    if failed:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
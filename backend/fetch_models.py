@@ -0,0 +1,42 @@
+import argparse
+import os
+
+from huggingface_hub import snapshot_download
+from transformers import AutoModelForTokenClassification
+
+from . import config
+from .loading import local_model_path
+
+# -------------------------------
+# Config
+# -------------------------------
+MODELS = [
+    (config.NER_MODEL, config.NER_REVISION),
+    (config.DISTIL_MODEL, config.DISTIL_REVISION),
+]
+PATTERNS = ["*.json", "*.txt", "*.model", "*.safetensors"]
+
+
+# -------------------------------
+# Download
+# -------------------------------
+def fetch(model_id, revision, model_dir):
+    """Snapshot ``model_id`` at ``revision`` into ``model_dir``, keeping the
+    weights as safetensors so the server can memory-map them."""
+    path = local_model_path(model_id, model_dir)
+    snapshot_download(model_id, revision=revision, local_dir=path, allow_patterns=PATTERNS)
+    if not any(f.endswith(".safetensors") for f in os.listdir(path)):
+        # Older repos only ship pickled weights: convert them once here
+        snapshot_download(model_id, revision=revision, local_dir=path, allow_patterns=["pytorch_model.bin"])
+        model = AutoModelForTokenClassification.from_pretrained(path, local_files_only=True)
+        model.save_pretrained(path, safe_serialization=True)
+        os.remove(os.path.join(path, "pytorch_model.bin"))
+    print(f"✅ {model_id}@{revision} -> {path}")
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Download the pinned NER models for offline serving.")
+    ap.add_argument("--model-dir", default=config.MODEL_DIR)
+    args = ap.parse_args()
+    for model_id, revision in MODELS:
+        fetch(model_id, revision, args.model_dir)
@@ -0,0 +1,260 @@
+"""Find the entries of organisation-specific deny-lists in texts.
+
+Usage (from the repository root):
+    python -m backend.gazetteer EMPLOYEE=employees.txt ACCOUNT=accounts.txt --out backend/gazetteer.idx
+
+Each list is a text file with one entry per line (an employee name, a
+customer account number, an internal project code, ...), flagged with the
+label given before "=". The lists are built offline into one index file
+holding an Aho-Corasick automaton, which finds every entry in a text in a
+single pass whatever the number of entries. Point PII_GAZETTEER_PATH at the
+file to add the "gazetteer" detector to /predict.
+
+Entries and texts are compared token by token, where a token is a word or a
+single punctuation mark, after case folding: "Project  Bluebird" matches
+"project bluebird", and "ACC-001" matches "ACC - 001", but "Tan" does not
+match inside "Tangent". Tokens are stored as 64-bit hashes, so a token that
+is on no list could in principle collide with one that is, at odds of about
+one in 2^64 / (tokens on the lists).
+
+The index is a header followed by flat numpy arrays. Loading it maps the
+file read-only instead of reading it, so every worker process (forked or
+not) shares the operating system's one cached copy of the pages.
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+import time
+from functools import lru_cache
+
+import numpy as np
+
+from .spans import Span
+
+MAGIC = b"PIIGAZ1\n"
+ALIGN = 64
+TOKEN = re.compile(r"\w+|[^\w\s]")
+
+
+# -------------------------------
+# Normalisation
+# -------------------------------
+def tokens(text):
+    """Token matches of ``text``; their case-folded text is what is compared."""
+    return list(TOKEN.finditer(text))
+
+
+# Prose repeats the same few thousand words, so their hashes are kept
+@lru_cache(maxsize=1 << 16)
+def token_hash(token):
+    return int.from_bytes(hashlib.blake2b(token.casefold().encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def lookup(sorted_keys, keys):
+    """Index of each of ``keys`` in ``sorted_keys``, or -1 where it is absent."""
+    if not len(sorted_keys):
+        return np.full(len(keys), -1, dtype=np.int64)
+    idx = np.searchsorted(sorted_keys, keys)
+    idx[idx == len(sorted_keys)] = 0
+    return np.where(sorted_keys[idx] == keys, idx, -1)
+
+
+# -------------------------------
+# Building the index
+# -------------------------------
+def build(lists):
+    """Automaton arrays for ``lists``, ``(label, entries)`` pairs. An entry
+    found on several lists keeps the label of the first. Returns
+    ``(arrays, header)``."""
+    labels, entries, duplicates = [], {}, 0
+    for label, values in lists:
+        if label not in labels:
+            labels.append(label)
+        for value in values:
+            key = tuple(m.group().casefold() for m in tokens(value))
+            if not key:
+                continue
+            if key in entries:
+                duplicates += 1
+                continue
+            entries[key] = labels.index(label)
+
+    # Token ids are positions in the sorted array of token hashes
+    hashes = {t: token_hash(t) for key in entries for t in key}
+    keys = np.fromiter(hashes.values(), dtype=np.uint64, count=len(hashes))
+    vocab = np.unique(keys)
+    ids = dict(zip(hashes, lookup(vocab, keys).tolist()))
+
+    # Trie of the token id sequences: sorted, each one shares the nodes of
+    # its common prefix with the one before. Node 0 is the root.
+    parent, token, depth, label = [-1], [0], [0], [-1]
+    path, prev = [], ()
+    for seq, li in sorted((tuple(ids[t] for t in key), li) for key, li in entries.items()):
+        common = 0
+        while common < min(len(prev), len(seq)) and prev[common] == seq[common]:
+            common += 1
+        del path[common:]
+        for k in range(common, len(seq)):
+            parent.append(path[-1] if path else 0)
+            token.append(seq[k])
+            depth.append(k + 1)
+            label.append(-1)
+            path.append(len(parent) - 1)
+        label[path[-1]] = li
+        prev = seq
+    parent, token, depth, label = (np.array(a, dtype=np.int64) for a in (parent, token, depth, label))
+
+    # Edges as sorted (state << 32 | token) keys
+    edge_keys = (parent[1:].astype(np.uint64) << np.uint64(32)) | token[1:].astype(np.uint64)
+    order = np.argsort(edge_keys)
+    edge_keys, targets = edge_keys[order], np.arange(1, len(parent), dtype=np.int64)[order]
+
+    def goto(states, toks):
+        found = lookup(edge_keys, (states.astype(np.uint64) << np.uint64(32)) | toks.astype(np.uint64))
+        return np.where(found >= 0, targets[found], -1)
+
+    # Failure links (longest proper suffix that is also a node) and output
+    # links (nearest node on the failure chain that ends an entry), one
+    # depth at a time since both only point at shallower nodes
+    fail = np.zeros(len(parent), dtype=np.int64)
+    out = np.full(len(parent), -1, dtype=np.int64)
+    for d in range(2, int(depth.max()) + 1):
+        nodes = np.flatnonzero(depth == d)
+        states, toks = fail[parent[nodes]], token[nodes]
+        result = np.zeros(len(nodes), dtype=np.int64)
+        pending = np.arange(len(nodes))
+        while len(pending):
+            nxt = goto(states[pending], toks[pending])
+            hit = nxt >= 0
+            result[pending[hit]] = nxt[hit]
+            pending = pending[~hit & (states[pending] != 0)]
+            states[pending] = fail[states[pending]]
+        fail[nodes] = result
+    for d in range(2, int(depth.max()) + 1):
+        nodes = np.flatnonzero(depth == d)
+        f = fail[nodes]
+        out[nodes] = np.where(label[f] >= 0, f, out[f])
+
+    arrays = {"vocab": vocab, "edge_keys": edge_keys, "targets": targets.astype(np.int32),
+              "fail": fail.astype(np.int32), "out": out.astype(np.int32),
+              "label": label.astype(np.int32), "depth": depth.astype(np.int32)}
+    header = {"labels": labels, "entries": len(entries), "duplicates": duplicates, "states": len(parent)}
+    return arrays, header
+
+
+def _data_start(header_size):
+    return -(-(len(MAGIC) + 8 + header_size) // ALIGN) * ALIGN
+
+
+def write_index(path, arrays, header):
+    """Write the arrays after a JSON header, each at a 64-byte aligned offset."""
+    layout, offset = {}, 0
+    for name, array in arrays.items():
+        layout[name] = [array.dtype.str, offset, len(array)]
+        offset += -(-array.nbytes // ALIGN) * ALIGN
+    blob = json.dumps({**header, "arrays": layout}).encode("utf-8")
+    start = _data_start(len(blob))
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(MAGIC + len(blob).to_bytes(8, "little") + blob)
+        for name, array in arrays.items():
+            f.seek(start + layout[name][1])
+            f.write(np.ascontiguousarray(array).tobytes())
+        f.truncate(start + offset)
+    os.replace(tmp, path)
+
+
+# -------------------------------
+# Matching
+# -------------------------------
+class Gazetteer:
+    """Memory-mapped index written by ``write_index``; ``scan`` returns the
+    spans of every entry found in a text, overlapping ones included."""
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{path} is not a gazetteer index (build one with python -m backend.gazetteer)")
+            size = int.from_bytes(f.read(8), "little")
+            header = json.loads(f.read(size))
+        data = np.memmap(path, dtype=np.uint8, mode="r")
+        start = _data_start(size)
+        for name, (dtype, offset, count) in header["arrays"].items():
+            lo = start + offset
+            setattr(self, name, data[lo:lo + count * np.dtype(dtype).itemsize].view(dtype))
+        self.path = path
+        self.labels = header["labels"]
+        self.entries = header["entries"]
+
+    def goto(self, state, token):
+        key = np.uint64(state << 32 | token)
+        i = int(np.searchsorted(self.edge_keys, key))
+        if i < len(self.edge_keys) and self.edge_keys[i] == key:
+            return int(self.targets[i])
+        return -1
+
+    def scan(self, text):
+        found = tokens(text)
+        if not found or not self.entries:
+            return []
+        words = [m.group() for m in found]
+        hashes = {w: token_hash(w) for w in set(words)}
+        keys = np.fromiter((hashes[w] for w in words), dtype=np.uint64, count=len(words))
+        spans, state = [], 0
+        for i, token in enumerate(lookup(self.vocab, keys).tolist()):
+            if token < 0:
+                # On no list: no state has an edge for it
+                state = 0
+                continue
+            nxt = self.goto(state, token)
+            while nxt < 0 and state:
+                state = int(self.fail[state])
+                nxt = self.goto(state, token)
+            state = max(nxt, 0)
+            node = state if self.label[state] >= 0 else int(self.out[state])
+            while node >= 0:
+                first = found[i - int(self.depth[node]) + 1]
+                spans.append(Span(first.start(), found[i].end(), self.labels[self.label[node]], 1.0, text))
+                node = int(self.out[node])
+        return spans
+
+    def info(self):
+        return {"path": self.path, "entries": self.entries, "labels": self.labels}
+
+
+# -------------------------------
+# Command line
+# -------------------------------
+def read_list(path):
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield line.strip()
+
+
+def parse_list(value):
+    label, sep, path = value.partition("=")
+    if not sep or not label or not path:
+        raise argparse.ArgumentTypeError(f"expected LABEL=path, got {value!r}")
+    return label, path
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("lists", nargs="+", type=parse_list, metavar="LABEL=path",
+                    help="a list file, one entry per line, and the label of its entries")
+    ap.add_argument("--out", default=os.path.join("backend", "gazetteer.idx"))
+    args = ap.parse_args()
+
+    t0 = time.perf_counter()
+    arrays, header = build((label, read_list(path)) for label, path in args.lists)
+    write_index(args.out, arrays, header)
+    print(f"✅ Indexed {header['entries']:,} entries ({header['duplicates']:,} duplicates skipped) "
+          f"as {header['states']:,} states in {args.out} "
+          f"({os.path.getsize(args.out) / 2**20:.1f} MB, {time.perf_counter() - t0:.1f}s)")
+
+
+if __name__ == "__main__":
+    main()
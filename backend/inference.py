@@ -1,7 +1,14 @@
 import os
 import re
+import time
+from concurrent.futures import ThreadPoolExecutor
 import torch
-from transformers import AutoTokenizer, AutoModelForTokenClassification
+from . import config, metrics
+from .regex_scanner import AnchoredPattern, RegexScanner
+from .cache import SpanCache, SegmentPlan
+from .gazetteer import Gazetteer
+from .spans import columnar
+from .loading import ModelSlot, load_token_classifier
 
 class PIIModel:
     # -------------------------------
@@ -38,153 +45,554 @@ class PIIModel:
     )
     POSTAL_CODE_RE = re.compile(r"\b\d{6}\b")
 
+    # Retried at every position, EMAIL_RE and MONEY_RE cost O(n^2) on a long
+    # run of address characters or digits; the scanner only tries them where
+    # such a run begins (see AnchoredPattern). An email starts at the first
+    # character of a run ending in "@"; money at a currency or the first
+    # digit of a number, and a failed number rules out its ",ddd" groups.
+    EMAIL_SCAN = AnchoredPattern(EMAIL_RE, re.compile(r"(?<![A-Za-z0-9._%+\-])[A-Za-z0-9._%+\-]+@"))
+    MONEY_SCAN = AnchoredPattern(
+        MONEY_RE,
+        re.compile(r"USD|SGD|EUR|GBP|AUD|CAD|\$|€|£|(?<!\d)\d", re.IGNORECASE),
+        re.compile(r"\d+(?:,\d{3}(?!\d))*"),
+    )
+
+    # (label, pattern, hint, near_digits): the hint occurs in every match of
+    # the pattern; near_digits patterns only match right around digit runs
+    SCANNER = RegexScanner([
+        ("EMAIL", EMAIL_SCAN, "@", False),
+        ("URL", URL_RE, "http", False),
+        ("IP", IPV4_RE, re.compile(r"\d\.\d"), True),
+        ("PHONE", SG_PHONE_RE, re.compile(r"\d{4}"), True),
+        ("NATIONAL_ID", NRIC_RE, re.compile(r"\d{7}"), True),
+        ("PASSPORT", PASSPORT_RE, re.compile(r"\d{7}"), True),
+        ("LICENSE_PLATE", LIC_PLATE_RE, re.compile(r"S[A-HJ-NP-Z][1-9]"), True),
+        ("DATE", DATE_RE, re.compile(r"\d"), False),
+        ("MONEY", MONEY_SCAN, re.compile(r"\d"), True),
+        ("HANDLE", SOCIAL_HANDLE_RE, "@", False),
+        ("POSTAL", POSTAL_CODE_RE, re.compile(r"\d{6}"), True),
+        ("CREDIT_CARD", CC_RE, re.compile(r"\d"), True),
+    ])
+    RULE_LABELS = frozenset(rule[0] for rule in SCANNER.rules)
+
 
 
 
     # -------------------------------
     # Initialize models
     # -------------------------------
-    def __init__(self):
-        # Base BERT NER
-        self.tok = AutoTokenizer.from_pretrained("dslim/bert-base-NER", use_fast=True)
-        self.ner = AutoModelForTokenClassification.from_pretrained("dslim/bert-base-NER").eval()
-        self.id2label = self.ner.config.id2label
+    WARMUP_TEXT = "Kim Han paid USD 500,000 on 15 August 2025 at 10 Anson Road Singapore 079903."
+
+    def __init__(self, chunking=config.CHUNKING, chunk_stride=config.CHUNK_STRIDE,
+                 chunk_batch_size=config.CHUNK_BATCH_SIZE, parallel=config.PARALLEL_DETECTORS,
+                 cache_entries=config.CACHE_MAX_ENTRIES, cache_path=config.CACHE_PATH,
+                 engine=config.ENGINE, onnx_dir=config.ONNX_DIR, model_dir=config.MODEL_DIR,
+                 offline=config.OFFLINE, lazy=config.LAZY_MODELS, warmup_runs=config.WARMUP_RUNS,
+                 student_model=config.STUDENT_MODEL, distil_model=config.DISTIL_MODEL,
+                 gazetteer_path=config.GAZETTEER_PATH, reuse=None):
+        t0 = time.perf_counter()
+        # Long texts are split into overlapping token windows instead of
+        # being truncated to the model context
+        self.chunking = chunking
+        self.chunk_stride = chunk_stride
+        self.chunk_batch_size = max(1, chunk_batch_size)
+
+        # Pipeline mode: both transformer passes run on stage threads while
+        # the calling thread does the regex scan (torch releases the GIL
+        # during the forward passes)
+        self.stages = ThreadPoolExecutor(max_workers=2, thread_name_prefix="pii-stage") if parallel else None
+
+        # Deny-list entries from a memory-mapped gazetteer index (optional)
+        self.gazetteer = Gazetteer(gazetteer_path) if gazetteer_path else None
+
+        # Forward passes run on the selected engine (eager, int8, ONNX Runtime);
+        # models come from the pinned copies in model_dir when present
+        self.engine = engine
+        self.lazy = lazy
+        threads = torch.get_num_threads()
+
+        def loader(model_id):
+            return lambda: load_token_classifier(model_id, engine, onnx_dir, threads, model_dir, offline)
+
+        # Base BERT NER, plus the fine-tuned DistilBERT (optional: without it
+        # only the regex and base NER detectors run). A unified student
+        # model stands in for both, with one forward pass per text.
+        self.unified = bool(student_model)
+        if self.unified:
+            self.primary = "student"
+            self.slots = {"student": ModelSlot("student", student_model, loader(student_model))}
+            models = student_model
+        else:
+            self.primary = "ner"
+            self.slots = {
+                "ner": ModelSlot("ner", config.NER_MODEL, loader(config.NER_MODEL)),
+                "distil": ModelSlot("distil", distil_model, loader(distil_model), required=False),
+            }
+            models = f"{config.NER_MODEL}|{distil_model}"
+        # Models that ``reuse`` (another PIIModel) already has are shared
+        # rather than loaded again, e.g. the base NER across registry versions
+        if reuse is not None and reuse.engine == engine:
+            for name, slot in reuse.slots.items():
+                if name in self.slots and slot.model_id == self.slots[name].model_id and slot.state == "ready":
+                    self.slots[name] = slot
+
+        # Paragraph-level cache of model spans; the namespace ties entries
+        # to the models and settings that produced them
+        self.cache = None
+        if cache_entries > 0:
+            namespace = f"{models}|{engine}|{self.chunking}|{self.chunk_stride}"
+            self.cache = SpanCache(cache_entries, cache_path, namespace)
+
+        self.startup = {"lazy": lazy, "warmup_runs": 0, "warmup_seconds": None}
+        if not lazy:
+            for slot in self.slots.values():
+                slot.get()
+            self.warmup(warmup_runs)
+        self.startup["startup_seconds"] = round(time.perf_counter() - t0, 3)
+
+    # -------------------------------
+    # Loaded models
+    # -------------------------------
+    @property
+    def tok(self): return self.slots[self.primary].get().tok
+
+    @property
+    def ner(self): return self.slots[self.primary].get().engine
+
+    @property
+    def id2label(self): return self.slots[self.primary].get().id2label
+
+    @property
+    def decoder(self): return self.slots[self.primary].get().decoder
+
+    def _distil(self, attr):
+        if "distil" not in self.slots:
+            return None
+        loaded = self.slots["distil"].get()
+        return getattr(loaded, attr) if loaded is not None else None
+
+    @property
+    def distil_tok(self): return self._distil("tok")
+
+    @property
+    def distil_ner(self): return self._distil("engine")
 
-        # Load fine-tuned DistilBERT from HF
-        hf_model_repo = "andrew2504/finetuned_redact_model"
-        try:
-            self.distil_tok = AutoTokenizer.from_pretrained(hf_model_repo)
-            self.distil_ner = AutoModelForTokenClassification.from_pretrained(hf_model_repo).eval()
-            self.distil_id2label = self.distil_ner.config.id2label
-        except Exception as e:
-            print(f"⚠️ Could not load HF model {hf_model_repo}: {e}")
-            self.distil_tok = None
-            self.distil_ner = None
-            self.distil_id2label = None
+    @property
+    def distil_id2label(self): return self._distil("id2label")
 
+    @property
+    def distil_decoder(self): return self._distil("decoder")
+
+    def warmup(self, runs):
+        # First forward passes pay for lazy kernel selection and allocator
+        # growth; do that before the first real request does
+        t0 = time.perf_counter()
+        for _ in range(runs):
+            self.ml_spans_batch([self.WARMUP_TEXT])
+            self.distil_spans_batch([self.WARMUP_TEXT])
+        self.startup["warmup_runs"] += runs
+        self.startup["warmup_seconds"] = round(time.perf_counter() - t0, 3)
+
+    def status(self):
+        slots = {name: slot.status() for name, slot in self.slots.items()}
+        ready = all(s["state"] == "ready" or (s["state"] == "pending" and self.lazy)
+                    or (s["state"] == "failed" and not s["required"]) for s in slots.values())
+        gazetteer = self.gazetteer.info() if self.gazetteer is not None else None
+        return {"ready": ready, "engine": self.engine, "models": slots, "gazetteer": gazetteer,
+                "startup": self.startup}
 
     # -------------------------------
     # Regex spans
     # -------------------------------
     def regex_spans(self, text):
-        spans = []
-        for pat, lab in [(self.EMAIL_RE,"EMAIL"), (self.URL_RE,"URL"),
-                         (self.IPV4_RE,"IP"), (self.SG_PHONE_RE,"PHONE"),
-                         (self.NRIC_RE,"NATIONAL_ID"), (self.PASSPORT_RE, "PASSPORT"),
-                         (self.LIC_PLATE_RE, "LICENSE_PLATE"), (self.DATE_RE, "DATE"),
-                         (self.MONEY_RE, "MONEY"), (self.SOCIAL_HANDLE_RE, "HANDLE"),
-                         (self.POSTAL_CODE_RE, "POSTAL")]:
-            for m in pat.finditer(text):
-                spans.append({"start": m.start(), "end": m.end(), "label": lab,
-                              "score": 1.0, "word": text[m.start():m.end()]})
-        for m in self.CC_RE.finditer(text):
-            spans.append({"start": m.start(), "end": m.end(), "label": "CREDIT_CARD",
-                          "score": 1.0, "word": m.group()})
-        return spans
+        return self.SCANNER.scan(text)
+
+    def scanner_for(self, labels):
+        """Scanner running only the rules of ``labels`` (all rules for None)."""
+        if labels is None:
+            return self.SCANNER
+        # Labels no rule has do not change the scanner
+        return self.SCANNER.only(frozenset(labels) & self.RULE_LABELS)
+
+    # -------------------------------
+    # Gazetteer spans (deny-lists)
+    # -------------------------------
+    def gazetteer_spans_batch(self, texts):
+        if self.gazetteer is None: return [[] for _ in texts]
+        with metrics.STAGE_SECONDS.time("gazetteer"):
+            return [self.gazetteer.scan(text) for text in texts]
+
+    # -------------------------------
+    # Detector selection
+    # -------------------------------
+    DETECTORS = ("regex", "ner", "distil", "gazetteer")
+
+    def detector_labels(self):
+        """Labels each detector can produce. The student's labels are split
+        between "ner" and "distil" by which of the two models they came from."""
+        labels = {"regex": set(self.RULE_LABELS),
+                  "gazetteer": set(self.gazetteer.labels) if self.gazetteer is not None else set(),
+                  "ner": {self.ML_LABELS.get(e, e) for e in self.decoder.ent_names if e}}
+        if self.unified:
+            student = labels["ner"]
+            labels["ner"] = student & set(self.ML_LABELS.values())
+            labels["distil"] = student - labels["ner"]
+            return labels
+        distil = self.distil_decoder
+        labels["distil"] = {e for e in distil.ent_names if e} if distil is not None else set()
+        return labels
+
+    def known_labels(self):
+        """Every label some detector can produce."""
+        return set().union(*self.detector_labels().values())
+
+    def select_detectors(self, labels=None, detectors=None):
+        """Detectors to run for a request: those asked for (all by default)
+        that can produce at least one of ``labels``."""
+        selected = set(detectors) if detectors is not None else set(self.DETECTORS)
+        unknown = selected - set(self.DETECTORS)
+        if unknown:
+            raise ValueError(f"Unknown detectors: {', '.join(sorted(unknown))}")
+        if labels is not None:
+            produces = self.detector_labels()
+            selected = {d for d in selected if produces[d] & set(labels)}
+        return selected
+
+    def stream_plan(self, labels=None, detectors=None):
+        """What /predict/stream runs for a request: the detectors, the
+        span methods of the model stages by event name, and the labels the
+        events may carry."""
+        run = self.select_detectors(labels, detectors)
+        produces = self.detector_labels()
+        allowed = set().union(*(produces[d] for d in run))
+        if labels is not None:
+            allowed &= set(labels)
+        methods = {}
+        # The student stands in for both models in the "ner" events
+        if "ner" in run or (self.unified and "distil" in run):
+            methods["ner"] = "ml_spans_batch"
+        if "distil" in run:
+            methods["distil"] = "distil_spans_batch"
+        return run, methods, allowed
+
+    # -------------------------------
+    # Cascade
+    # -------------------------------
+    # Sentences end at . ! ? followed by whitespace, or at a line break.
+    # A sentence goes to the models only if it has a regex hit, a digit,
+    # @ or a currency sign, or a capitalised word after its first one.
+    SENTENCE_BREAK = re.compile(r"(?<=[.!?])\s+|\n\s*")
+    CANDIDATE_RE = re.compile(r"[\d@$€£¥]|\s[A-Z]")
+
+    @classmethod
+    def cascade_pieces(cls, text, regex):
+        """Parts of ``text`` worth running the models on, as ``(offset,
+        piece)`` pairs; neighbouring candidate sentences stay together so
+        the models keep their context."""
+        hits = sorted((s.start, s.end) for s in regex)
+        pieces, pos, h = [], 0, 0
+        bounds = [(m.start(), m.end()) for m in cls.SENTENCE_BREAK.finditer(text)] + [(len(text), len(text))]
+        for brk_start, brk_end in bounds:
+            sentence = text[pos:brk_start]
+            while h < len(hits) and hits[h][1] <= pos:
+                h += 1
+            hit = h < len(hits) and hits[h][0] < brk_start
+            if sentence.strip() and (hit or cls.CANDIDATE_RE.search(sentence)):
+                if pieces and pieces[-1][1] == "open":
+                    pieces[-1][2] = brk_start
+                else:
+                    pieces.append([pos, "open", brk_start])
+            elif pieces:
+                pieces[-1][1] = "closed"
+            pos = brk_end
+        return [(lo, text[lo:hi]) for lo, _, hi in pieces]
+
+    # -------------------------------
+    # Batched token classification
+    # -------------------------------
+    @staticmethod
+    def max_window(tok, ner):
+        return min(tok.model_max_length, ner.config.max_position_embeddings)
+
+    def encode_windows(self, texts, tok, ner):
+        """Tokenize ``texts`` into rows for the model. Returns the encoding and,
+        for every row, the index of the text it came from. Without chunking
+        each text is one (truncated) row; with chunking a long text becomes
+        several rows overlapping by ``chunk_stride`` tokens, with offsets
+        still pointing into the original text."""
+        if not self.chunking:
+            enc = tok(texts, return_offsets_mapping=True, return_tensors="pt",
+                      truncation=True, padding=True)
+            return enc, list(range(len(texts)))
+        max_len = self.max_window(tok, ner)
+        enc = tok(texts, return_offsets_mapping=True, return_tensors="pt",
+                  truncation=True, padding=True, max_length=max_len,
+                  stride=min(self.chunk_stride, max_len // 2),
+                  return_overflowing_tokens=True)
+        return enc, enc.pop("overflow_to_sample_mapping").tolist()
+
+    def token_spans_batch(self, texts, tok, ner, decoder, threshold=0.8, model="ner"):
+        texts = list(texts)
+        with metrics.STAGE_SECONDS.time(f"{model}_tokenize"):
+            enc, rows = self.encode_windows(texts, tok, ner)
+        offsets = enc.pop("offset_mapping")
+        if metrics.REGISTRY.enabled:
+            self.record_windows(model, enc, rows, len(texts))
+        windows = [[] for _ in texts]
+        # Run the rows in slices of chunk_batch_size, each trimmed to its own
+        # longest row; padding positions carry (0, 0) offsets and are dropped
+        # by the decoder like special tokens.
+        for lo in range(0, len(rows), self.chunk_batch_size):
+            hi = min(lo + self.chunk_batch_size, len(rows))
+            width = int(enc["attention_mask"][lo:hi].sum(dim=1).max())
+            part = {k: v[lo:hi, :width] for k, v in enc.items()}
+            with metrics.STAGE_SECONDS.time(f"{model}_forward"):
+                logits = ner(**part)
+            with metrics.STAGE_SECONDS.time(f"{model}_decode"):
+                probs = torch.softmax(logits, dim=-1)
+                row_texts = [texts[b] for b in rows[lo:hi]]
+                decoded = decoder.decode(row_texts, probs, offsets[lo:hi, :width], threshold)
+            for b, spans in zip(rows[lo:hi], decoded):
+                windows[b].append(spans)
+        return [spans[0] if len(spans) == 1 else self.reconcile_windows(text, spans)
+                for text, spans in zip(texts, windows)]
+
+    def record_windows(self, model, enc, rows, n_texts):
+        metrics.INPUT_TOKENS.inc(model, amount=int(enc["attention_mask"].sum()))
+        metrics.WINDOWS.inc(model, amount=len(rows))
+        if self.chunking:
+            truncated = len(set(r for i, r in enumerate(rows) if i and rows[i - 1] == r))
+        else:
+            truncated = sum(1 for e in enc.encodings or [] if e.overflowing)
+        if truncated:
+            metrics.TRUNCATED.inc(model, amount=truncated)
+
+    @staticmethod
+    def reconcile_windows(text, windows):
+        """Combine the spans found in overlapping windows of one text. The same
+        entity seen from two windows (possibly cut short at a window edge)
+        overlaps itself, so overlapping spans of one label are unioned."""
+        spans = sorted((s for w in windows for s in w), key=lambda s: (s.start, s.end))
+        out, last = [], {}
+        for s in spans:
+            prev = last.get(s.label)
+            if prev is not None and s.start < prev.end:
+                prev.end = max(prev.end, s.end)
+                prev.score = max(prev.score, s.score)
+                continue
+            out.append(s)
+            last[s.label] = s
+        return out
 
     # -------------------------------
     # ML spans (base BERT)
     # -------------------------------
     def ml_spans(self, text, threshold=0.8):
-        enc = self.tok(text, return_offsets_mapping=True, return_tensors="pt", truncation=True)
-        offsets = enc.pop("offset_mapping")[0].tolist()
-        with torch.no_grad():
-            logits = self.ner(**enc).logits[0]
-        probs = torch.softmax(logits, dim=-1)
-
-        spans, cur = [], None
-        for i, (st, en) in enumerate(offsets):
-            if en == 0: continue
-            label_id = int(probs[i].argmax())
-            label = self.id2label[label_id]
-            score = float(probs[i, label_id])
-            if score < threshold or label == "O":
-                if cur: spans.append(cur); cur=None
-                continue
-            pref, ent = (label.split("-") + [""])[:2]
-            if pref=="B" or cur is None or (cur and ent!=cur["label"]):
-                if cur: spans.append(cur)
-                cur={"start": st, "end": en, "label": ent, "score": round(score,4), "word": text[st:en]}
-            else:
-                cur["end"]=en
-                cur["word"]=text[cur["start"]:en]
-                cur["score"]=max(cur["score"], round(score,4))
-        if cur: spans.append(cur)
-        # map some tags to standard PII labels
-        for s in spans:
-            if s["label"]=="PER": s["label"]="PERSON"
-            if s["label"]=="LOC": s["label"]="GPE"
-            if s["label"]=="MISC": s["label"]="ORG"
-        return spans
+        return self.ml_spans_batch([text], threshold)[0]
+
+    # map some tags to standard PII labels
+    ML_LABELS = {"PER": "PERSON", "LOC": "GPE", "MISC": "ORG"}
+
+    def ml_spans_batch(self, texts, threshold=0.8):
+        if not texts: return []
+        batch = self.token_spans_batch(texts, self.tok, self.ner, self.decoder, threshold)
+        for spans in batch:
+            for s in spans:
+                s.label = self.ML_LABELS.get(s.label, s.label)
+        return batch
 
     # -------------------------------
     # Distil spans (custom fine-tuned)
     # -------------------------------
     def distil_spans(self, text, threshold=0.8):
-        if self.distil_ner is None: return []
-        enc = self.distil_tok(text, return_offsets_mapping=True, return_tensors="pt", truncation=True)
-        offsets = enc.pop("offset_mapping")[0].tolist()
-        with torch.no_grad():
-            logits = self.distil_ner(**enc).logits[0]
-        probs = torch.softmax(logits, dim=-1)
-
-        spans, cur = [], None
-        for i, (st, en) in enumerate(offsets):
-            if en == 0: continue
-            label_id = int(probs[i].argmax())
-            label = self.distil_id2label[label_id]
-            score = float(probs[i, label_id])
-            if score < threshold or label == "O":
-                if cur: spans.append(cur); cur=None
-                continue
-            pref, ent = (label.split("-") + [""])[:2]
-            if pref=="B" or cur is None or (cur and ent!=cur["label"]):
-                if cur: spans.append(cur)
-                cur={"start": st, "end": en, "label": ent, "score": round(score,4), "word": text[st:en]}
-            else:
-                cur["end"]=en
-                cur["word"]=text[cur["start"]:en]
-                cur["score"]=max(cur["score"], round(score,4))
-        if cur: spans.append(cur)
-        return spans
+        return self.distil_spans_batch([text], threshold)[0]
+
+    def distil_spans_batch(self, texts, threshold=0.8):
+        if self.distil_ner is None: return [[] for _ in texts]
+        if not texts: return []
+        return self.token_spans_batch(texts, self.distil_tok, self.distil_ner,
+                                      self.distil_decoder, threshold, model="distil")
+
+    # -------------------------------
+    # Student spans (both label sets in one pass)
+    # -------------------------------
+    def student_spans_batch(self, texts, labels=None, threshold=0.8):
+        if not texts: return []
+        batch = self.token_spans_batch(texts, self.tok, self.ner, self.decoder, threshold, model="student")
+        if labels is not None:
+            batch = [[s for s in spans if s.label in labels] for spans in batch]
+        return batch
 
     # -------------------------------
     # Merge overlapping spans
     # -------------------------------
-    def merge_spans(self, spans):
-        spans = sorted(spans, key=lambda s: (s["start"], -s["end"]))
+    @staticmethod
+    def merge_spans(spans):
+        spans = sorted(spans, key=lambda s: (s.start, -s.end))
         out=[]
         for s in spans:
-            if out and s["start"] <= out[-1]["end"]:
+            if out and s.start <= out[-1].end:
                 # pick longer or higher score
-                if (s["end"]-s["start"] > out[-1]["end"]-out[-1]["start"]) or (s["score"] > out[-1]["score"]):
+                if (s.end-s.start > out[-1].end-out[-1].start) or (s.score > out[-1].score):
                     out[-1] = s
             else:
                 out.append(s)
         return out
 
     # -------------------------------
-    # Full prediction
+    # Group merged spans by (label, word)
     # -------------------------------
-    def predict(self, text):
-        all_spans = self.regex_spans(text) + self.ml_spans(text) + self.distil_spans(text)
-        merged = self.merge_spans(all_spans)
-
+    @staticmethod
+    def group_spans(merged):
         grouped = {}
         for span in merged:
-            key = (span["label"], span["word"])
-            start_end = [span["start"], span["end"]]  # convert tuple to list
-            score = span["score"]
+            word = span.word
+            key = (span.label, word)
+            start_end = [span.start, span.end]
+            score = span.score
 
             if key not in grouped:
                 grouped[key] = {
                     "position": [start_end],
-                    "label": span["label"],
+                    "label": span.label,
                     "score": score,
-                    "word": span["word"]
+                    "word": word
                 }
             else:
                 grouped[key]["position"].append(start_end)
                 grouped[key]["score"] = max(grouped[key]["score"], score)
 
         return list(grouped.values())
+
+    # -------------------------------
+    # Full prediction
+    # -------------------------------
+    def predict(self, text):
+        return self.predict_batch([text])[0]
+
+    @staticmethod
+    def prepare_batch(texts):
+        """Work shared by both transformer passes: each distinct non-blank
+        text is tokenized and run once per model. Returns those texts and,
+        for every input text, its index among them (None when blank)."""
+        unique, index, seen = [], [], {}
+        for text in texts:
+            if not text.strip():
+                index.append(None)
+                continue
+            if text not in seen:
+                seen[text] = len(unique)
+                unique.append(text)
+            index.append(seen[text])
+        return unique, index
+
+    def run_stage(self, fn, texts):
+        """Start ``fn(texts)`` on a stage thread in pipeline mode (or run it
+        right away otherwise); returns a callable giving its result."""
+        if self.stages is None:
+            result = fn(texts)
+            return lambda: result
+        return self.stages.submit(fn, texts).result
+
+    def predict_batch(self, texts, labels=None, detectors=None, cascade=False, output="grouped"):
+        """``labels`` restricts the result to those labels and skips the
+        detectors that cannot produce any of them; ``detectors`` picks from
+        regex/ner/distil/gazetteer. With ``cascade`` the regex scan runs
+        first and the models only see the sentences it (or a cheap cue)
+        flags. ``output`` is "grouped" (one entity per label and word, as
+        /predict returns) or "columnar" (parallel arrays, see
+        spans.columnar)."""
+        texts = list(texts)
+        run = self.select_detectors(labels, detectors)
+        unique, index = self.prepare_batch(texts)
+        regex = [[] for _ in texts]
+        scan_texts = "regex" in run
+
+        # Model inputs: whole texts, or their candidate pieces in cascade mode
+        pieces = [[(0, text)] for text in unique]
+        if cascade:
+            # The cascade signal always uses every regex rule
+            hits = self.scan_batch(unique)
+            pieces = [self.cascade_pieces(text, h) for text, h in zip(unique, hits)]
+            if scan_texts and labels is None:
+                regex = [hits[i] if i is not None else [] for i in index]
+                scan_texts = False
+        inputs = [piece for parts in pieces for _, piece in parts]
+
+        # The models see one paragraph at a time; only paragraphs missing
+        # from the cache go through them. Spans from only one of the models
+        # are not cached.
+        distil_failed = "distil" in self.slots and self.slots["distil"].state == "failed"
+        cache = self.cache if not distil_failed and run >= {"ner", "distil"} else None
+        plan = SegmentPlan(inputs, cache)
+        segments = plan.missing
+
+        def none():
+            return [[] for _ in segments]
+
+        if self.unified:
+            # One student pass; with only one of ner/distil asked for, keep that one's labels
+            wanted = None
+            if not run >= {"ner", "distil"}:
+                produces = self.detector_labels()
+                wanted = set().union(*(produces[d] for d in run & {"ner", "distil"}))
+            ml_job = self.run_stage(lambda segs: self.student_spans_batch(segs, wanted), segments) \
+                if run & {"ner", "distil"} else none
+            distil_job = none
+        else:
+            ml_job = self.run_stage(self.ml_spans_batch, segments) if "ner" in run else none
+            distil_job = self.run_stage(self.distil_spans_batch, segments) if "distil" in run else none
+        if scan_texts:
+            regex = self.scan_batch(texts, labels)
+        listed = self.gazetteer_spans_batch(texts) if "gazetteer" in run else [[] for _ in texts]
+        computed = [m + d for m, d in zip(ml_job(), distil_job())]
+        # A lazy DistilBERT is only loaded by its job; if that failed, these
+        # spans lack its labels and must not be cached as the full result
+        found = plan.resolve(computed, store="distil" not in self.slots or self.slots["distil"].state == "ready")
+
+        # Shift piece spans back into their texts
+        models, k = [], 0
+        for text, parts in zip(unique, pieces):
+            spans = []
+            for offset, _ in parts:
+                spans += found[k] if not offset else [s.shifted(offset, text) for s in found[k]]
+                k += 1
+            models.append(spans)
+
+        keep = set(labels) if labels is not None else None
+        results = []
+        for text, regex_s, listed_s, i in zip(texts, regex, listed, index):
+            all_spans = regex_s + listed_s + (models[i] if i is not None else [])
+            if keep is not None:
+                all_spans = [s for s in all_spans if s.label in keep]
+            with metrics.STAGE_SECONDS.time("merge"):
+                merged = self.merge_spans(all_spans)
+            if metrics.REGISTRY.enabled:
+                for span in merged:
+                    metrics.SPANS.inc(span.label)
+            if output == "columnar":
+                results.append(columnar(merged))
+                continue
+            with metrics.STAGE_SECONDS.time("group"):
+                results.append(self.group_spans(merged))
+        if metrics.REGISTRY.enabled:
+            metrics.BATCH_SIZE.observe(len(texts))
+            metrics.INPUT_CHARS.inc(amount=sum(len(text) for text in texts))
+        return results
+
+    def scan_batch(self, texts, labels=None):
+        scanner = self.scanner_for(labels)
+        with metrics.STAGE_SECONDS.time("regex"):
+            return [scanner.scan(text) for text in texts]
+
+    def after_fork(self):
+        """Call in a child forked from the process that built this model:
+        threads do not survive a fork, so the stage pool is rebuilt, and the
+        cache gets its own SQLite connection. The weights stay shared."""
+        if self.stages is not None:
+            self.stages = ThreadPoolExecutor(max_workers=2, thread_name_prefix="pii-stage")
+        if self.cache is not None:
+            self.cache.after_fork()
+
+    def cache_stats(self):
+        return self.cache.stats() if self.cache is not None else {"enabled": False}
@@ -0,0 +1,92 @@
+import os
+import threading
+import time
+
+from transformers import AutoTokenizer, AutoModelForTokenClassification
+
+from .decoding import BIODecoder
+from .engines import load_engine
+
+
+# -------------------------------
+# Local model directory
+# -------------------------------
+def local_model_path(model_id, model_dir):
+    return os.path.join(model_dir, model_id.strip("/").replace("/", "__"))
+
+
+def resolve_model(model_id, model_dir):
+    """Prefer the pinned copy in ``model_dir`` (see fetch_models.py) over a
+    Hugging Face Hub lookup; a directory is used as it is."""
+    if os.path.isdir(model_id):
+        return model_id
+    path = local_model_path(model_id, model_dir)
+    return path if os.path.isdir(path) else model_id
+
+
+class LoadedModel:
+    """Tokenizer, inference engine and BIO decoder of one NER model."""
+
+    def __init__(self, tok, engine):
+        self.tok = tok
+        self.engine = engine
+        self.id2label = engine.config.id2label
+        self.decoder = BIODecoder(self.id2label)
+
+
+def load_token_classifier(model_id, engine, onnx_dir, threads, model_dir, offline):
+    path = resolve_model(model_id, model_dir)
+    local = os.path.isdir(path)
+    if not local and offline:
+        raise FileNotFoundError(f"{model_id} is not in {model_dir}; run python -m backend.fetch_models")
+    # Local safetensors are memory-mapped rather than read into fresh buffers
+    safetensors = local and any(f.endswith(".safetensors") for f in os.listdir(path))
+    tok = AutoTokenizer.from_pretrained(path, use_fast=True, local_files_only=local or offline)
+    model = AutoModelForTokenClassification.from_pretrained(
+        path, local_files_only=local or offline, low_cpu_mem_usage=True,
+        use_safetensors=True if safetensors else None)
+    return LoadedModel(tok, load_engine(engine, model_id, model, onnx_dir, threads))
+
+
+# -------------------------------
+# Load state
+# -------------------------------
+class ModelSlot:
+    """A model that is loaded on the first ``get()`` and remembers how that
+    went. A required model that fails to load raises (and is retried on the
+    next call); an optional one is marked failed and ``get()`` returns None."""
+
+    def __init__(self, name, model_id, load, required=True):
+        self.name = name
+        self.model_id = model_id
+        self.required = required
+        self.state = "pending"
+        self.error = None
+        self.load_seconds = None
+        self.value = None
+        self._load = load
+        self._lock = threading.Lock()
+
+    def get(self):
+        if self.state == "ready" or (self.state == "failed" and not self.required):
+            return self.value
+        with self._lock:
+            if self.state == "ready" or (self.state == "failed" and not self.required):
+                return self.value
+            self.state = "loading"
+            t0 = time.perf_counter()
+            try:
+                self.value = self._load()
+                self.state, self.error = "ready", None
+            except Exception as e:
+                self.state, self.error = "failed", str(e)
+                if self.required:
+                    raise
+                print(f"⚠️ Could not load model {self.model_id}: {e}")
+            finally:
+                self.load_seconds = round(time.perf_counter() - t0, 3)
+        return self.value
+
+    def status(self):
+        return {"model": self.model_id, "state": self.state, "required": self.required,
+                "load_seconds": self.load_seconds, "error": self.error}
@@ -0,0 +1,254 @@
+"""Counters and histograms exported in the Prometheus text format.
+
+Recording is a dict update under a lock, so it can stay on in production;
+with PII_METRICS=0 every recording call returns immediately. Worker
+processes ship what they recorded back with each result (see ``drain`` and
+``merge``), so /metrics covers every worker. The server processes forked by
+backend.serve cannot do that, so they share what they recorded through a
+directory instead (see ``share``).
+"""
+import bisect
+import glob
+import os
+import pickle
+import threading
+import time
+
+from . import config
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128)
+
+
+class Registry:
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.metrics = {}
+        self._lock = threading.Lock()
+        self._shared_path = None
+
+    def counter(self, name, help, labels=()):
+        return self._add(Counter(self, name, help, labels))
+
+    def histogram(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        return self._add(Histogram(self, name, help, labels, buckets))
+
+    def _add(self, metric):
+        self.metrics[metric.name] = metric
+        return metric
+
+    def drain(self):
+        """Return everything recorded so far and reset it."""
+        with self._lock:
+            out = {}
+            for name, metric in self.metrics.items():
+                if metric.values:
+                    out[name], metric.values = metric.values, {}
+            return out
+
+    def merge(self, drained):
+        with self._lock:
+            for name, values in drained.items():
+                self.metrics[name].merge(values)
+
+    def render(self):
+        peers = self._peers() if self._shared_path else []
+        with self._lock:
+            lines = []
+            for metric in self.metrics.values():
+                values = metric.values
+                for peer in peers:
+                    values = metric.combined(values, peer.get(metric.name, {}))
+                lines.append(f"# HELP {metric.name} {metric.help}")
+                lines.append(f"# TYPE {metric.name} {metric.kind}")
+                lines.extend(metric.samples(values))
+            return "\n".join(lines) + "\n"
+
+    # -------------------------------
+    # Sharing between server processes
+    # -------------------------------
+    def share(self, directory, slot, interval=1.0):
+        """Make /metrics in this process cover every process sharing
+        ``directory``. Call it in each worker after the fork: the worker
+        writes what it has recorded to ``worker-<slot>.pickle`` there every
+        ``interval`` seconds, and render() adds up the other workers'
+        files. A worker forked again into a slot carries on from the
+        previous one's file, so the totals do not go backwards."""
+        if not self.enabled:
+            return
+        self._shared_path = os.path.join(directory, f"worker-{slot}.pickle")
+        # Start from the slot's file rather than whatever the parent had
+        # recorded before forking
+        self.drain()
+        try:
+            with open(self._shared_path, "rb") as f:
+                self.merge(pickle.load(f))
+        except FileNotFoundError:
+            pass
+
+        def save_forever():
+            while True:
+                self._save()
+                time.sleep(interval)
+
+        threading.Thread(target=save_forever, name="metrics-share", daemon=True).start()
+
+    def _save(self):
+        with self._lock:
+            data = pickle.dumps({name: metric.values for name, metric in self.metrics.items()})
+        tmp = f"{self._shared_path}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, self._shared_path)
+
+    def _peers(self):
+        peers = []
+        for path in glob.glob(os.path.join(os.path.dirname(self._shared_path), "worker-*.pickle")):
+            if path == self._shared_path:
+                continue
+            try:
+                with open(path, "rb") as f:
+                    peers.append(pickle.load(f))
+            except FileNotFoundError:
+                pass
+        return peers
+
+
+def _labels(names, values, extra=""):
+    pairs = [f'{n}="{v}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, registry, name, help, labels):
+        self.registry, self.name, self.help, self.labels = registry, name, help, labels
+        self.values = {}
+
+    def inc(self, *labels, amount=1):
+        if not self.registry.enabled:
+            return
+        with self.registry._lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+    def merge(self, values):
+        self.values = self.combined(self.values, values)
+
+    @staticmethod
+    def combined(mine, theirs):
+        out = dict(mine)
+        for labels, value in theirs.items():
+            out[labels] = out.get(labels, 0) + value
+        return out
+
+    def samples(self, values):
+        return [f"{self.name}{_labels(self.labels, k)} {v}" for k, v in sorted(values.items())]
+
+
+class Histogram:
+    """Values are ``[bucket counts..., count, sum]`` per label set; bucket
+    counts are per bucket here and made cumulative when rendered."""
+    kind = "histogram"
+
+    def __init__(self, registry, name, help, labels, buckets):
+        self.registry, self.name, self.help, self.labels = registry, name, help, labels
+        self.buckets = tuple(buckets)
+        self.values = {}
+
+    def observe(self, value, *labels):
+        if not self.registry.enabled:
+            return
+        i = bisect.bisect_left(self.buckets, value)
+        with self.registry._lock:
+            row = self.values.get(labels)
+            if row is None:
+                row = self.values[labels] = [0] * (len(self.buckets) + 3)
+            row[i] += 1
+            row[-2] += 1
+            row[-1] += value
+
+    def time(self, *labels):
+        return _Timer(self, labels) if self.registry.enabled else _NOOP
+
+    def merge(self, values):
+        self.values = self.combined(self.values, values)
+
+    @staticmethod
+    def combined(mine, theirs):
+        out = {labels: list(row) for labels, row in mine.items()}
+        for labels, row in theirs.items():
+            acc = out.setdefault(labels, [0] * len(row))
+            for i, v in enumerate(row):
+                acc[i] += v
+        return out
+
+    def samples(self, values):
+        out = []
+        for labels, row in sorted(values.items()):
+            total = 0
+            for bound, n in zip(self.buckets + ("+Inf",), row):
+                total += n
+                le = f'le="{bound}"'
+                out.append(f"{self.name}_bucket{_labels(self.labels, labels, le)} {total}")
+            out.append(f"{self.name}_count{_labels(self.labels, labels)} {row[-2]}")
+            out.append(f"{self.name}_sum{_labels(self.labels, labels)} {row[-1]}")
+        return out
+
+
+class _Timer:
+    __slots__ = ("hist", "labels", "t0")
+
+    def __init__(self, hist, labels):
+        self.hist, self.labels = hist, labels
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.hist.observe(time.perf_counter() - self.t0, *self.labels)
+
+
+class _NoTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return None
+
+
+_NOOP = _NoTimer()
+
+
+# -------------------------------
+# Metrics
+# -------------------------------
+REGISTRY = Registry(enabled=config.METRICS)
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "pii_stage_seconds", "Time spent per pipeline stage.", ("stage",))
+REQUEST_SECONDS = REGISTRY.histogram(
+    "pii_request_seconds", "Time to answer a request, per route.", ("route",))
+QUEUE_SECONDS = REGISTRY.histogram(
+    "pii_queue_wait_seconds", "Time a job waited before it started running, per queue.", ("queue",))
+BATCH_SIZE = REGISTRY.histogram(
+    "pii_batch_size", "Texts per batched model call.", buckets=SIZE_BUCKETS)
+INPUT_CHARS = REGISTRY.counter(
+    "pii_input_chars_total", "Characters of text sent to the detectors.")
+INPUT_TOKENS = REGISTRY.counter(
+    "pii_input_tokens_total", "Tokens fed to each model, padding excluded.", ("model",))
+WINDOWS = REGISTRY.counter(
+    "pii_windows_total", "Token windows run through each model.", ("model",))
+TRUNCATED = REGISTRY.counter(
+    "pii_truncated_texts_total",
+    "Texts longer than a model's context; cut off without chunking, split into windows with it.",
+    ("model",))
+SPANS = REGISTRY.counter(
+    "pii_spans_total", "Entities returned, by label.", ("label",))
+MODEL_TEXTS = REGISTRY.counter(
+    "pii_model_texts_total", "Texts run through each model version.", ("version",))
+OCR_PAGES = REGISTRY.counter(
+    "pii_ocr_pages_total", "Pages OCR'd, by whether the page cache had them.", ("cache",))
@@ -0,0 +1,222 @@
+import base64
+import bisect
+import hashlib
+import io
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pytesseract
+# For Windows, specify the tesseract.exe path if it's not in your PATH
+# pytesseract.pytesseract.tesseract_cmd = r"C:\Program Files\Tesseract-OCR\tesseract.exe"
+from PIL import Image, ImageDraw, ImageSequence
+
+from . import metrics
+
+
+# -------------------------------
+# Decoding uploads
+# -------------------------------
+def _pdf_pages(data, dpi, max_pages):
+    """Render a PDF with pypdfium2, or pdf2image (poppler) as a fallback.
+    Raises ValueError for a damaged or encrypted PDF."""
+    try:
+        import pypdfium2 as pdfium
+    except ImportError:
+        pdfium = None
+    if pdfium is not None:
+        try:
+            pdf = pdfium.PdfDocument(data)
+        except pdfium.PdfiumError as e:
+            raise ValueError(f"Unreadable PDF: {e}") from e
+        try:
+            return [pdf[i].render(scale=dpi / 72).to_pil() for i in range(min(len(pdf), max_pages))]
+        except pdfium.PdfiumError as e:
+            raise ValueError(f"Unreadable PDF: {e}") from e
+        finally:
+            pdf.close()
+    try:
+        from pdf2image import convert_from_bytes
+        from pdf2image.exceptions import PDFInfoNotInstalledError, PDFPageCountError, PDFSyntaxError
+    except ImportError as e:
+        raise ImportError("PDF uploads need pypdfium2 or pdf2image: pip install pypdfium2") from e
+    try:
+        return convert_from_bytes(data, dpi=dpi, first_page=1, last_page=max_pages)
+    except PDFInfoNotInstalledError as e:
+        raise ImportError("pdf2image needs poppler installed, or pip install pypdfium2") from e
+    except (PDFPageCountError, PDFSyntaxError) as e:
+        raise ValueError(f"Unreadable PDF: {e}") from e
+
+
+def load_pages(data, dpi=300, max_pages=100):
+    """Decode an uploaded image, multi-page TIFF or PDF into PIL pages
+    without touching the disk. Raises ValueError for anything else."""
+    if data[:5] == b"%PDF-":
+        return _pdf_pages(data, dpi, max_pages)
+    try:
+        image = Image.open(io.BytesIO(data))
+        pages = []
+        for frame in ImageSequence.Iterator(image):
+            if len(pages) == max_pages:
+                break
+            pages.append(frame.copy())
+        return pages
+    except (OSError, Image.DecompressionBombError) as e:
+        raise ValueError(f"Unreadable image: {e}") from e
+
+
+# -------------------------------
+# Preprocessing
+# -------------------------------
+def preprocess(image, max_side=0, binarize=False):
+    """Optionally shrink so the longer side is at most ``max_side`` pixels
+    and threshold to black and white. Tesseract binarizes internally anyway;
+    doing it here on a smaller image is cheaper for large photos and scans."""
+    if not max_side and not binarize:
+        return image
+    image = image.convert("L")
+    if max_side and max(image.size) > max_side:
+        scale = max_side / max(image.size)
+        size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+        image = image.resize(size, Image.Resampling.LANCZOS)
+    if binarize:
+        # Global threshold at the mean brightness
+        cut = int(np.asarray(image).mean())
+        image = image.point(lambda p: 255 if p > cut else 0)
+    return image
+
+
+def ocr_page(image, lang="eng", max_side=0, binarize=False):
+    with metrics.STAGE_SECONDS.time("ocr_preprocess"):
+        image = preprocess(image, max_side, binarize)
+    with metrics.STAGE_SECONDS.time("ocr"):
+        return pytesseract.image_to_string(image, lang=lang)
+
+
+# -------------------------------
+# Word geometry
+# -------------------------------
+def ocr_words(image, lang="eng", max_side=0, binarize=False):
+    """OCR one page into ``(block, paragraph, line, word, box)`` tuples, where
+    ``box`` is ``(left, top, width, height)`` in the page's own pixels (boxes
+    from a downscaled page are scaled back up)."""
+    with metrics.STAGE_SECONDS.time("ocr_preprocess"):
+        small = preprocess(image, max_side, binarize)
+    sx, sy = image.width / small.width, image.height / small.height
+    with metrics.STAGE_SECONDS.time("ocr"):
+        data = pytesseract.image_to_data(small, lang=lang, output_type=pytesseract.Output.DICT)
+    words = []
+    for i, word in enumerate(data["text"]):
+        word = word.strip()
+        if not word:
+            continue
+        box = (round(data["left"][i] * sx), round(data["top"][i] * sy),
+               round(data["width"][i] * sx), round(data["height"][i] * sy))
+        words.append((data["block_num"][i], data["par_num"][i], data["line_num"][i], word, box))
+    return words
+
+
+class PageLayout:
+    """Text of a document rebuilt from its OCR'd words, remembering where
+    every word sits. Words on a line are joined by spaces, lines by a
+    newline, and paragraphs and pages by a blank line."""
+
+    def __init__(self, pages):
+        parts, pos = [], 0
+        self.starts, self.words = [], []
+        for page, words in enumerate(pages):
+            last = None
+            for block, par, line, word, box in words:
+                if parts:
+                    if last is None or (block, par) != last[:2]:
+                        sep = "\n\n"
+                    elif line != last[2]:
+                        sep = "\n"
+                    else:
+                        sep = " "
+                    parts.append(sep)
+                    pos += len(sep)
+                last = (block, par, line)
+                self.starts.append(pos)
+                self.words.append((pos + len(word), page, (block, par, line), box))
+                parts.append(word)
+                pos += len(word)
+        self.text = "".join(parts)
+
+    def boxes(self, start, end):
+        """Boxes covering the characters ``start:end``: one per page line,
+        spanning every word of that line the range touches."""
+        lines = {}
+        i = max(0, bisect.bisect_right(self.starts, start) - 1)
+        while i < len(self.starts) and self.starts[i] < end:
+            word_end, page, line, (left, top, width, height) = self.words[i]
+            if word_end > start:
+                box = lines.get((page, line))
+                right, bottom = left + width, top + height
+                if box is not None:
+                    left, top = min(left, box[0]), min(top, box[1])
+                    right, bottom = max(right, box[2]), max(bottom, box[3])
+                lines[(page, line)] = (left, top, right, bottom)
+            i += 1
+        return [{"page": page, "left": l, "top": t, "width": r - l, "height": b - t}
+                for (page, _), (l, t, r, b) in lines.items()]
+
+
+def redact_pages(pages, boxes, padding=2):
+    """Black out ``boxes`` on copies of ``pages``; returns base64 PNGs."""
+    out = []
+    for n, page in enumerate(pages):
+        page = page.convert("RGB")
+        draw = ImageDraw.Draw(page)
+        for box in boxes:
+            if box["page"] == n:
+                draw.rectangle((box["left"] - padding, box["top"] - padding,
+                                box["left"] + box["width"] + padding,
+                                box["top"] + box["height"] + padding), fill="black")
+        buf = io.BytesIO()
+        page.save(buf, "PNG")
+        out.append(base64.b64encode(buf.getvalue()).decode("ascii"))
+    return out
+
+
+# -------------------------------
+# Repeat images
+# -------------------------------
+def page_digest(image):
+    """Digest of a page's decoded pixels (mode, size and every byte). The
+    same page gets the same key whatever lossless format or container it
+    arrives in; pages that differ in any pixel, e.g. one account number on
+    a form, get different keys, so one upload is never answered with
+    another's text."""
+    digest = hashlib.blake2b(digest_size=32)
+    digest.update(image.mode.encode())
+    digest.update(repr(image.size).encode())
+    digest.update(image.tobytes())
+    return digest.hexdigest()
+
+
+class OCRCache:
+    """LRU map from a page's pixel digest to its OCR result."""
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max(1, int(max_entries))
+        self.hits = self.misses = 0
+        self._pages = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            text = self._pages.get(key)
+            if text is None:
+                self.misses += 1
+                return None
+            self._pages.move_to_end(key)
+            self.hits += 1
+            return text
+
+    def put(self, key, text):
+        with self._lock:
+            self._pages[key] = text
+            self._pages.move_to_end(key)
+            while len(self._pages) > self.max_entries:
+                self._pages.popitem(last=False)
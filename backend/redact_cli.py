@@ -0,0 +1,168 @@
+"""Run the PII detector over a JSONL or CSV corpus.
+
+Usage (from the repository root):
+    python -m backend.redact_cli corpus.jsonl -o redacted.jsonl --workers 4
+    python -m backend.redact_cli corpus.csv -o redacted.jsonl --output redacted --resume
+
+Input is read one record at a time and handed to worker processes in
+batches; each worker loads the models once. Every output line is the input
+record plus "pii" (the /predict entities) and/or "redacted" (the text with
+each entity replaced by its placeholder, e.g. Email_1), in input order.
+A checkpoint next to the output file records how far the run got, so
+``--resume`` continues an interrupted run without redoing or duplicating
+records.
+"""
+import argparse
+import csv
+import json
+import multiprocessing as mp
+import os
+import sys
+import time
+from collections import deque
+
+from . import config
+from .redaction import redact_text
+from .workers import default_torch_threads
+
+_model = None
+
+
+# -------------------------------
+# Worker processes
+# -------------------------------
+def _init_worker(torch_threads):
+    global _model
+    import torch
+    from .inference import PIIModel
+    torch.set_num_threads(torch_threads)
+    _model = PIIModel()
+
+
+def _run_batch(texts):
+    return _model.predict_batch(texts)
+
+
+# -------------------------------
+# Input
+# -------------------------------
+def read_records(path, fmt):
+    with open(path, newline="" if fmt == "csv" else None, encoding="utf-8") as f:
+        if fmt == "csv":
+            yield from csv.DictReader(f)
+        else:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def batches(records, batch_size, skip=0):
+    batch = []
+    for n, record in enumerate(records):
+        if n < skip:
+            continue
+        batch.append(record)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+# -------------------------------
+# Checkpoint
+# -------------------------------
+def load_checkpoint(path):
+    if not os.path.exists(path):
+        return {"records": 0, "bytes": 0}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_checkpoint(path, records, size):
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump({"records": records, "bytes": size}, f)
+    os.replace(tmp, path)
+
+
+# -------------------------------
+# Run
+# -------------------------------
+def run(args):
+    fmt = args.format or ("csv" if args.input.lower().endswith(".csv") else "jsonl")
+    checkpoint = args.output_path + ".ckpt"
+    state = load_checkpoint(checkpoint) if args.resume else {"records": 0, "bytes": 0}
+    size = os.path.getsize(args.output_path) if os.path.exists(args.output_path) else 0
+    if size < state["bytes"]:
+        sys.exit(f"{args.output_path} has {size} bytes but its checkpoint records {state['bytes']}; "
+                 "it was moved or cut short, so rerun without --resume to start over")
+    out = open(args.output_path, "r+b" if state["bytes"] else "wb")
+    # Drop anything written after the last checkpoint
+    out.truncate(state["bytes"])
+    out.seek(state["bytes"])
+
+    workers = max(1, args.workers)
+    ctx = mp.get_context("spawn")
+    pool = ctx.Pool(workers, initializer=_init_worker,
+                    initargs=(args.torch_threads or default_torch_threads(workers),))
+    done, docs, chars = state["records"], 0, 0
+    t0 = last_report = time.perf_counter()
+    pending = deque()
+
+    def write(batch, job):
+        nonlocal done, docs, chars, last_report
+        results = job.get()
+        lines = []
+        for record, entities in zip(batch, results):
+            record = dict(record)
+            if args.output in ("spans", "both"):
+                record["pii"] = entities
+            if args.output in ("redacted", "both"):
+                record["redacted"] = redact_text(record.get(args.text_field) or "", entities)
+            lines.append(json.dumps(record, ensure_ascii=False) + "\n")
+        out.write("".join(lines).encode("utf-8"))
+        out.flush()
+        os.fsync(out.fileno())
+        done, docs = done + len(batch), docs + len(batch)
+        chars += sum(len(record.get(args.text_field) or "") for record in batch)
+        save_checkpoint(checkpoint, done, out.tell())
+        now = time.perf_counter()
+        if now - last_report >= args.report_every:
+            last_report = now
+            print(f"{done} records | {docs / (now - t0):.1f} docs/s | {chars / (now - t0):.0f} chars/s",
+                  file=sys.stderr)
+
+    try:
+        records = read_records(args.input, fmt)
+        for batch in batches(records, args.batch_size, skip=state["records"]):
+            texts = [record.get(args.text_field) or "" for record in batch]
+            pending.append((batch, pool.apply_async(_run_batch, (texts,))))
+            # Keep a few batches queued per worker, not the whole corpus
+            if len(pending) >= 2 * workers:
+                write(*pending.popleft())
+        while pending:
+            write(*pending.popleft())
+    finally:
+        pool.terminate()
+        out.close()
+
+    elapsed = time.perf_counter() - t0
+    print(f"✅ {docs} records in {elapsed:.1f}s ({docs / elapsed:.1f} docs/s, "
+          f"{chars / elapsed:.0f} chars/s); {done} total in {args.output_path}")
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Detect and redact PII in a JSONL or CSV corpus.")
+    ap.add_argument("input")
+    ap.add_argument("-o", "--output-path", required=True, help="JSONL file to write")
+    ap.add_argument("--format", choices=["jsonl", "csv"], help="input format (default: from the extension)")
+    ap.add_argument("--text-field", default="text")
+    ap.add_argument("--output", choices=["spans", "redacted", "both"], default="both")
+    ap.add_argument("--workers", type=int, default=2, help="worker processes, each with its own models")
+    ap.add_argument("--torch-threads", type=int, default=config.TORCH_THREADS,
+                    help="torch threads per worker (0 splits the cores evenly)")
+    ap.add_argument("--batch-size", type=int, default=config.BATCH_MAX_SIZE)
+    ap.add_argument("--resume", action="store_true", help="continue from the checkpoint of an earlier run")
+    ap.add_argument("--report-every", type=float, default=10.0, help="seconds between progress lines")
+    run(ap.parse_args())
@@ -0,0 +1,34 @@
+def placeholder_keys(entities):
+    """Placeholder for every entity, numbered per label in order of
+    appearance like the frontend does: Email_1, Email_2, Person_1, ..."""
+    counters, keys = {}, []
+    for entity in entities:
+        label = entity["label"][:1] + entity["label"][1:].lower()
+        counters[label] = counters.get(label, 0) + 1
+        keys.append(f"{label}_{counters[label]}")
+    return keys
+
+
+def redact_text(text, entities, keys=None):
+    """Replace every position of every entity (as returned by
+    PIIModel.predict) with its placeholder key, in one pass over ``text``."""
+    keys = keys or placeholder_keys(entities)
+    positions = sorted((start, end, key) for entity, key in zip(entities, keys)
+                       for start, end in entity["position"])
+    parts, pos = [], 0
+    for start, end, key in positions:
+        if start < pos:
+            continue  # overlaps a position that was already replaced
+        parts.append(text[pos:start])
+        parts.append(key)
+        pos = end
+    parts.append(text[pos:])
+    return "".join(parts)
+
+
+def unredact_text(text, mapping, pattern):
+    """Put the original values back for every placeholder in ``text`` (e.g. an
+    LLM response to a redacted prompt); ``pattern`` comes from the vault."""
+    if pattern is None:
+        return text
+    return pattern.sub(lambda m: mapping[m.group()], text)
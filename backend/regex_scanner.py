@@ -0,0 +1,117 @@
+import re
+from functools import lru_cache
+
+from .spans import Span
+
+
+class AnchoredPattern:
+    """A pattern that is only tried where one of its matches can begin.
+
+    ``re`` looks for a match by trying the pattern at every position in
+    turn. For a pattern like ``\\d+(?:,\\d{3})*\\s?dollars`` each try on a
+    run of n digits without "dollars" reads to the end of the run, so the
+    run costs O(n^2) and one long number in a pasted log stalls the scan.
+    Here ``regex`` is tried with ``match`` at the positions ``starts``
+    finds, and at the end of the previous match, the way ``re`` resumes
+    there. ``starts`` may leave out a position if a match there implies a
+    match at an earlier position that was not left out, e.g. a digit after
+    a digit when the pattern begins with ``\\d+``. After a failed try,
+    ``skip`` (if given) is matched there and the positions it covers are
+    left out too; it may only cover positions where a match would imply
+    one at the failed position.
+
+    ``finditer`` takes the same arguments and gives the same matches as
+    ``regex.finditer``, as long as ``regex`` never matches the empty string.
+    """
+
+    def __init__(self, regex, starts, skip=None):
+        self.regex, self.starts, self.skip = regex, starts, skip
+
+    def finditer(self, text, pos=0, endpos=None):
+        endpos = len(text) if endpos is None else endpos
+        while pos < endpos:
+            m = self.regex.match(text, pos, endpos)
+            if m is not None:
+                yield m
+                pos = m.end()
+                continue
+            resume = pos + 1
+            if self.skip is not None:
+                covered = self.skip.match(text, pos, endpos)
+                if covered is not None:
+                    resume = max(resume, covered.end())
+            start = self.starts.search(text, resume, endpos)
+            if start is None:
+                return
+            pos = start.start()
+
+
+class RegexScanner:
+    """Runs a fixed list of labelled patterns over a text in one call.
+
+    Each rule is ``(label, pattern, hint, near_digits)``, where the pattern
+    is a compiled pattern or an AnchoredPattern. The hint is a
+    literal or a compiled pattern that occurs in every possible match of the
+    rule; hints are checked at most once per text and a rule whose hint is
+    absent is skipped without scanning.
+
+    Rules marked ``near_digits`` only ever match within a few characters of a
+    run of digits (digits separated by at most one other character). The
+    text is scanned once for such runs and those rules are then run only
+    over the windows around them, so long stretches of prose are skipped.
+    Matches are returned in rule order and are exactly what running
+    ``finditer`` over the whole text for every rule would give.
+    """
+
+    DIGIT_RUN = re.compile(r"\d(?:\D?\d)*")
+    # Widest non-digit context a near_digits match (or its lookarounds) may
+    # need on either side of a digit run, e.g. "USD " or " dollars".
+    MARGIN = 10
+
+    def __init__(self, rules):
+        self.rules = [(label, pattern, hint, near_digits)
+                      for label, pattern, hint, near_digits in rules]
+
+    @lru_cache(maxsize=64)
+    def only(self, labels):
+        """Scanner running only the rules whose label is in ``labels`` (a
+        frozenset); the scanners of the last 64 label sets are kept."""
+        return RegexScanner([rule for rule in self.rules if rule[0] in labels])
+
+    @staticmethod
+    def _has(text, hint):
+        if hint is None:
+            return True
+        if isinstance(hint, str):
+            return hint in text
+        return hint.search(text) is not None
+
+    def digit_windows(self, text):
+        windows = []
+        for m in self.DIGIT_RUN.finditer(text):
+            lo = max(0, m.start() - self.MARGIN)
+            hi = min(len(text), m.end() + self.MARGIN)
+            if windows and lo <= windows[-1][1]:
+                windows[-1][1] = hi
+            else:
+                windows.append([lo, hi])
+        return windows
+
+    def scan(self, text):
+        spans, seen, windows = [], {}, None
+        for label, pattern, hint, near_digits in self.rules:
+            key = hint if isinstance(hint, str) or hint is None else hint.pattern
+            if key not in seen:
+                seen[key] = self._has(text, hint)
+            if not seen[key]:
+                continue
+            if near_digits:
+                if windows is None:
+                    windows = self.digit_windows(text)
+                # pos/endpos keep lookbehinds looking at the real text
+                matches = (m for lo, hi in windows for m in pattern.finditer(text, lo, hi))
+            else:
+                matches = pattern.finditer(text)
+            for m in matches:
+                spans.append(Span(m.start(), m.end(), label, 1.0, text))
+        return spans
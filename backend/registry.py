@@ -0,0 +1,166 @@
+import os
+import random
+import re
+import threading
+
+from . import config
+
+VERSION_RE = re.compile(r"[A-Za-z0-9_][A-Za-z0-9_.-]*")
+
+
+class ModelRegistry:
+    """Versions of the fine-tuned model as directories under ``root`` (each
+    with the config, weights and tokenizer files save_pretrained writes);
+    with PII_STUDENT_MODEL set, the versions are of the student instead.
+    "default" is the model from the configuration.
+
+    Loaded versions are PIIModels built by ``factory``; they share the base
+    NER with the active one. Kept loaded are the active version, the one
+    before it (so a rollback is instant) and the canary. The active version
+    is written to ``root/ACTIVE``, so a restart comes back with it.
+    """
+
+    DEFAULT = "default"
+
+    def __init__(self, root, factory):
+        self.root = root
+        self.factory = factory
+        self.models = {}
+        self.loading = {}
+        self.active = None
+        self.previous = None
+        self.canary = None
+        self.canary_percent = 0.0
+        self._lock = threading.RLock()
+
+    def versions(self):
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(v for v in os.listdir(self.root)
+                      if VERSION_RE.fullmatch(v) and os.path.isdir(os.path.join(self.root, v)))
+
+    def check(self, version):
+        if version != self.DEFAULT and version not in self.versions():
+            raise KeyError(f"No model version {version!r} in {self.root}")
+
+    def build(self, version):
+        if version == self.DEFAULT:
+            return self.factory(reuse=self.models.get(self.active))
+        path = os.path.join(self.root, version)
+        kind = "student_model" if config.STUDENT_MODEL else "distil_model"
+        model = self.factory(reuse=self.models.get(self.active), lazy=False, **{kind: path})
+        # The fine-tuned slot is optional in a PIIModel, so a broken version
+        # would load as "failed" and serve without its labels
+        for slot in model.slots.values():
+            if slot.state != "ready":
+                raise RuntimeError(f"Model version {version!r} did not load: {slot.error}")
+        return model
+
+    # -------------------------------
+    # Loading
+    # -------------------------------
+    def initial(self):
+        """Build and activate the version from ``root/ACTIVE`` (or the
+        default); the worker pool calls this at startup."""
+        version = self.DEFAULT
+        try:
+            with open(os.path.join(self.root, "ACTIVE")) as f:
+                version = f.read().strip() or self.DEFAULT
+            self.check(version)
+        except FileNotFoundError:
+            pass
+        except KeyError as e:
+            print(f"⚠️ {e}; starting with the default model")
+            version = self.DEFAULT
+        model = self.build(version)
+        with self._lock:
+            self.models[version] = model
+            self.active = version
+        return model
+
+    def load(self, version):
+        """Build and warm up ``version`` (blocking; run it off the event
+        loop). Serving goes on with the active version meanwhile."""
+        self.check(version)
+        with self._lock:
+            if version in self.models:
+                return self.models[version]
+            self.loading[version] = "loading"
+        try:
+            model = self.build(version)
+        except Exception as e:
+            with self._lock:
+                self.loading[version] = f"failed: {e}"
+            raise
+        with self._lock:
+            self.models[version] = model
+            del self.loading[version]
+        print(f"✅ Model version {version} loaded")
+        return model
+
+    # -------------------------------
+    # Switching
+    # -------------------------------
+    def activate(self, version):
+        """Make a loaded ``version`` the active one and return its model.
+        Requests already running keep the model they started with."""
+        with self._lock:
+            model = self.models.get(version)
+            if model is None:
+                raise LookupError(f"Model version {version!r} is not loaded")
+            if version != self.active:
+                self.previous, self.active = self.active, version
+            if self.canary == version:
+                self.canary, self.canary_percent = None, 0.0
+            self._evict()
+            self._save()
+            return model
+
+    def rollback(self):
+        with self._lock:
+            if self.previous is None or self.previous not in self.models:
+                raise LookupError("No previous model version to roll back to")
+            return self.activate(self.previous)
+
+    def set_canary(self, version, percent):
+        with self._lock:
+            if version is None or percent <= 0:
+                self.canary, self.canary_percent = None, 0.0
+            elif version not in self.models:
+                raise LookupError(f"Model version {version!r} is not loaded")
+            else:
+                self.canary, self.canary_percent = version, min(100.0, float(percent))
+            self._evict()
+
+    def route(self):
+        """Version for the next request: the canary for ``canary_percent``
+        percent of requests, None (the active version) otherwise."""
+        canary, percent = self.canary, self.canary_percent
+        if canary is not None and random.random() * 100 < percent:
+            return canary
+        return None
+
+    def get(self, version):
+        """Model of ``version``; one dropped since it was routed to falls
+        back to the active model."""
+        with self._lock:
+            return self.models.get(version) or self.models[self.active]
+
+    def _evict(self):
+        keep = {self.active, self.previous, self.canary}
+        for version in [v for v in self.models if v not in keep]:
+            del self.models[version]
+
+    def _save(self):
+        os.makedirs(self.root, exist_ok=True)
+        path = os.path.join(self.root, "ACTIVE")
+        with open(path + ".tmp", "w") as f:
+            f.write(self.active + "\n")
+        os.replace(path + ".tmp", path)
+
+    def status(self):
+        with self._lock:
+            return {"versions": [self.DEFAULT] + self.versions(), "active": self.active,
+                    "previous": self.previous, "canary": self.canary,
+                    "canary_percent": self.canary_percent, "loaded": sorted(self.models),
+                    "loading": dict(self.loading)}
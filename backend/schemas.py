@@ -1,14 +1,70 @@
-from pydantic import BaseModel
-from typing import List, Dict, Any
+from pydantic import BaseModel, Field
+from typing import List, Dict, Any, Optional, Literal, Union
 
 PIIEntity = Dict[str, Any]
+# Parallel arrays: labels, start, end, label_id (index into labels), score
+ColumnarPII = Dict[str, List[Any]]
+Detector = Literal["regex", "ner", "distil", "gazetteer"]
 
-class PredictRequest(BaseModel):
+class PredictOptions(BaseModel):
+    # Only return these labels; detectors that cannot produce any are skipped
+    labels: Optional[List[str]] = None
+    # Run only these detectors (default: all)
+    detectors: Optional[List[Detector]] = None
+    # Regex first, then the models only on sentences that look like PII
+    cascade: bool = False
+
+    def options(self):
+        """Hashable form, so requests with the same options can share a batch."""
+        return (tuple(sorted(set(self.labels))) if self.labels is not None else None,
+                tuple(sorted(set(self.detectors))) if self.detectors is not None else None,
+                self.cascade, "grouped")
+
+class FormatOptions(PredictOptions):
+    # "columnar" returns parallel arrays instead of one dict per entity
+    format: Literal["grouped", "columnar"] = "grouped"
+
+    def options(self):
+        return super().options()[:3] + (self.format,)
+
+class PredictRequest(FormatOptions):
     text: str
 
 class PredictResponse(BaseModel):
-    pii: List[PIIEntity]
+    pii: Union[List[PIIEntity], ColumnarPII]
+
+class PredictBatchRequest(FormatOptions):
+    texts: List[str]
+
+class PredictBatchResponse(BaseModel):
+    results: List[Union[List[PIIEntity], ColumnarPII]]
 
 class ExtractedTextResponse(BaseModel):
     extracted_text: str
-    
\ No newline at end of file
+
+class OCRPredictResponse(BaseModel):
+    extracted_text: str
+    pii: List[PIIEntity]
+    redacted_pages: Optional[List[str]] = None
+
+class RedactRequest(PredictOptions):
+    text: str
+
+class RedactResponse(BaseModel):
+    redacted_text: str
+    # Pass to /unredact to restore the original values
+    token: str
+    # The /predict entities, each with the placeholder that replaced it
+    pii: List[PIIEntity]
+
+class UnredactRequest(BaseModel):
+    token: str
+    text: str
+
+class UnredactResponse(BaseModel):
+    text: str
+
+class CanaryRequest(BaseModel):
+    # A loaded version; None (or percent 0) turns the canary off
+    version: Optional[str] = None
+    percent: float = Field(0.0, ge=0, le=100)
\ No newline at end of file
@@ -0,0 +1,260 @@
+"""Serve the API from several worker processes that share one copy of the models.
+
+Usage (from the repository root):
+    python -m backend.serve --workers 4 --port 3000
+
+Running ``uvicorn --workers N`` makes every worker import backend.app and
+load both transformers itself, so N workers cost N copies of the weights.
+Here the parent process loads the models once, freezes them out of the
+garbage collector's reach and then forks the workers, which share the
+weights copy-on-write and accept connections on one listening socket.
+
+Each worker is pinned to its own slice of the CPUs (``--no-pin`` turns that
+off) and runs that many torch threads, so the workers do not oversubscribe
+the machine. Every ``--report-every`` seconds the parent prints each
+worker's memory (RSS, and PSS, which splits shared pages between the
+processes sharing them) and requests per second; a worker that dies is
+forked again from the parent. Linux only.
+
+A token from /redact has to be found by /unredact on whichever worker
+takes that request, so the workers share the placeholder vault through
+the SQLite file PII_VAULT_PATH, or a temporary one when it is not set.
+For the same reason the workers pool their metrics in a temporary
+directory, so /metrics covers all of them whichever one is scraped.
+"""
+import argparse
+import gc
+import multiprocessing as mp
+import os
+import shutil
+import signal
+import socket
+import sys
+import tempfile
+import time
+
+import torch
+import uvicorn
+
+from . import config, metrics
+from .workers import default_torch_threads
+
+
+# -------------------------------
+# CPUs and memory
+# -------------------------------
+def partition_cpus(cpus, workers):
+    """Split ``cpus`` into ``workers`` contiguous slices of near-equal size;
+    with more workers than CPUs, workers share CPUs round-robin."""
+    if workers >= len(cpus):
+        return [[cpus[i % len(cpus)]] for i in range(workers)]
+    size, extra = divmod(len(cpus), workers)
+    slices, lo = [], 0
+    for i in range(workers):
+        hi = lo + size + (i < extra)
+        slices.append(cpus[lo:hi])
+        lo = hi
+    return slices
+
+
+def memory_mb(pid):
+    """RSS, PSS and private memory of ``pid`` in MB (None where unavailable)."""
+    fields = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                name, _, value = line.partition(":")
+                if value.strip().endswith("kB"):
+                    fields[name] = int(value.split()[0]) / 1024
+    except OSError:
+        return None
+    return {"rss": fields.get("Rss", 0), "pss": fields.get("Pss", 0),
+            "private": fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0)}
+
+
+def format_cpus(cpus):
+    if cpus is None:
+        return "all"
+    return f"{cpus[0]}-{cpus[-1]}" if len(cpus) > 1 else str(cpus[0])
+
+
+# -------------------------------
+# Workers
+# -------------------------------
+def run_worker(app, model, vault, sock, slot, cpus, threads, served, log_level, shared_dir):
+    """Body of a forked worker; never returns."""
+    code = 0
+    try:
+        if cpus is not None:
+            os.sched_setaffinity(0, cpus)
+        torch.set_num_threads(threads)
+        model.after_fork()
+        vault.after_fork()
+        metrics.REGISTRY.share(shared_dir, slot)
+
+        @app.middleware("http")
+        async def count_requests(request, call_next):
+            response = await call_next(request)
+            served[slot] += 1
+            return response
+
+        server = uvicorn.Server(uvicorn.Config(app, log_level=log_level))
+        server.run(sockets=[sock])
+    except BaseException as e:
+        if not isinstance(e, (KeyboardInterrupt, SystemExit)):
+            print(f"⚠️ Worker {slot} failed: {e}", file=sys.stderr)
+            code = 1
+    finally:
+        # Skip the parent's atexit handlers and buffered state
+        os._exit(code)
+
+
+class Supervisor:
+    def __init__(self, args, app, model, vault, sock, shared_dir):
+        self.args, self.app, self.model, self.vault, self.sock = args, app, model, vault, sock
+        self.shared_dir = shared_dir
+        self.workers = max(1, args.workers)
+        if args.pin and hasattr(os, "sched_getaffinity"):
+            self.cpus = partition_cpus(sorted(os.sched_getaffinity(0)), self.workers)
+        else:
+            self.cpus = [None] * self.workers
+        self.threads = [args.torch_threads or (len(cpus) if cpus is not None
+                                               else default_torch_threads(self.workers))
+                        for cpus in self.cpus]
+        # Requests answered per worker slot, written by the workers
+        self.served = mp.RawArray("d", self.workers)
+        self.pids = {}
+        self.stopping = False
+
+    def spawn(self, slot):
+        self.served[slot] = 0
+        pid = os.fork()
+        if pid == 0:
+            run_worker(self.app, self.model, self.vault, self.sock, slot, self.cpus[slot],
+                       self.threads[slot], self.served, self.args.log_level, self.shared_dir)
+        self.pids[pid] = slot
+        print(f"✅ Worker {slot} (pid {pid}) on CPUs {format_cpus(self.cpus[slot])} "
+              f"with {self.threads[slot]} torch threads")
+
+    def reap(self):
+        while self.pids:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+            if pid == 0:
+                return
+            slot = self.pids.pop(pid, None)
+            if slot is not None and not self.stopping:
+                print(f"⚠️ Worker {slot} (pid {pid}) exited with status {status}; restarting", file=sys.stderr)
+                self.spawn(slot)
+
+    def report(self, last, elapsed):
+        total = 0.0
+        for pid, slot in sorted(self.pids.items(), key=lambda item: item[1]):
+            mem = memory_mb(pid)
+            mem = (f"RSS {mem['rss']:.0f} MB, PSS {mem['pss']:.0f} MB, private {mem['private']:.0f} MB"
+                   if mem is not None else "memory n/a")
+            rate = max(0.0, self.served[slot] - last[slot]) / elapsed
+            total += rate
+            print(f"worker {slot} pid {pid} | {mem} | {rate:.1f} req/s")
+        parent = memory_mb(os.getpid())
+        if parent is not None:
+            print(f"parent pid {os.getpid()} | RSS {parent['rss']:.0f} MB | total {total:.1f} req/s")
+
+    def run(self):
+        for slot in range(self.workers):
+            self.spawn(slot)
+        last, last_time = list(self.served), time.monotonic()
+        try:
+            while self.pids:
+                time.sleep(1)
+                self.reap()
+                now = time.monotonic()
+                if now - last_time >= self.args.report_every:
+                    self.report(last, now - last_time)
+                    last, last_time = list(self.served), now
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+
+    def stop(self):
+        self.stopping = True
+        for pid in self.pids:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        for pid in list(self.pids):
+            try:
+                os.waitpid(pid, 0)
+            except ChildProcessError:
+                pass
+        self.pids.clear()
+
+
+# -------------------------------
+# Main
+# -------------------------------
+def _interrupt(signum, frame):
+    # Stop on SIGTERM the same way as on Ctrl+C
+    raise KeyboardInterrupt
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=3000)
+    ap.add_argument("--workers", type=int, default=2, help="worker processes sharing the models")
+    ap.add_argument("--torch-threads", type=int, default=config.TORCH_THREADS,
+                    help="torch threads per worker (0: one per CPU of the worker's slice)")
+    ap.add_argument("--no-pin", dest="pin", action="store_false", help="do not pin workers to CPUs")
+    ap.add_argument("--report-every", type=float, default=30.0, help="seconds between memory/throughput reports")
+    ap.add_argument("--log-level", default="info")
+    args = ap.parse_args()
+
+    if not hasattr(os, "fork"):
+        sys.exit("backend.serve needs os.fork; use uvicorn backend.app:app on this platform")
+    if config.EXECUTOR != "thread":
+        sys.exit("backend.serve runs the model in each worker's threads; unset PII_EXECUTOR=process")
+    if config.REGISTRY_DIR:
+        sys.exit("Hot reload swaps the model of a single process; serve PII_REGISTRY_DIR with uvicorn")
+
+    # Files the workers share: their metrics, and the vault unless
+    # PII_VAULT_PATH keeps it elsewhere
+    shared_dir = tempfile.mkdtemp(prefix="pii-serve-")
+    if args.workers > 1 and not config.VAULT_PATH:
+        config.VAULT_PATH = os.path.join(shared_dir, "vault.sqlite")
+
+    from .app import app, pool, vault
+    from .inference import PIIModel
+
+    # The tokenizers' own thread pool does not survive a fork either
+    os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+    # One torch thread while loading: the workers' thread pools are created
+    # after the fork, never inherited half-initialised from the parent
+    torch.set_num_threads(1)
+    model = PIIModel(lazy=False)
+    pool.model = model
+    # Move everything loaded so far out of the collector's generations, so
+    # collections in the workers do not write to (and copy) the shared pages
+    gc.collect()
+    gc.freeze()
+    mem = memory_mb(os.getpid())
+    if mem is not None:
+        print(f"✅ Models loaded in the parent (RSS {mem['rss']:.0f} MB)")
+
+    sock = socket.socket(socket.AF_INET6 if ":" in args.host else socket.AF_INET)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((args.host, args.port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    print(f"✅ Listening on http://{args.host}:{args.port} with {args.workers} workers")
+
+    signal.signal(signal.SIGTERM, _interrupt)
+    try:
+        Supervisor(args, app, model, vault, sock, shared_dir).run()
+    finally:
+        shutil.rmtree(shared_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
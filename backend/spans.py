@@ -0,0 +1,46 @@
+class Span:
+    """One detected entity: characters ``start:end`` of ``text``.
+
+    Spans are created by the thousand on long documents, so they are a
+    slotted object rather than a dict, and ``word`` is sliced from the text
+    only when asked for (in practice only for spans that survive merging).
+    """
+
+    __slots__ = ("start", "end", "label", "score", "text")
+
+    def __init__(self, start, end, label, score, text):
+        self.start = start
+        self.end = end
+        self.label = label
+        self.score = score
+        self.text = text
+
+    @property
+    def word(self):
+        return self.text[self.start:self.end]
+
+    def shifted(self, offset, text):
+        """The same span in ``text``, where this span's text starts at ``offset``."""
+        return Span(self.start + offset, self.end + offset, self.label, self.score, text)
+
+    def to_dict(self):
+        return {"start": self.start, "end": self.end, "label": self.label,
+                "score": self.score, "word": self.word}
+
+    def __repr__(self):
+        return f"Span({self.start}, {self.end}, {self.label!r}, {self.score}, {self.word!r})"
+
+
+def columnar(spans):
+    """Merged spans as parallel arrays: ``label_id`` indexes ``labels``."""
+    labels, ids = [], {}
+    out = {"labels": labels, "start": [], "end": [], "label_id": [], "score": []}
+    for s in spans:
+        if s.label not in ids:
+            ids[s.label] = len(labels)
+            labels.append(s.label)
+        out["start"].append(s.start)
+        out["end"].append(s.end)
+        out["label_id"].append(ids[s.label])
+        out["score"].append(s.score)
+    return out
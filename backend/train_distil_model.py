@@ -1,8 +1,12 @@
+import argparse
+import glob
 import os
+import time
 import torch
 import pandas as pd
 from datasets import Dataset
-from transformers import AutoTokenizer, AutoModelForTokenClassification, TrainingArguments, Trainer
+from transformers import (AutoTokenizer, AutoModelForTokenClassification, TrainingArguments, Trainer,
+                          TrainerCallback, DataCollatorForTokenClassification)
 
 # -------------------------------
 # Config
@@ -20,49 +24,76 @@ ID2LABEL = {i:l for i,l in enumerate(LABEL_LIST)}
 # Load CSV dataset
 # -------------------------------
 def load_csv_folder(data_folder):
-    all_samples = []
-    for file in os.listdir(data_folder):
-        if file.endswith(".csv"):
-            df = pd.read_csv(os.path.join(data_folder, file))
-            for _, row in df.iterrows():
-                tokens = row["text"].split()
-                labels = row["label"].split()
-                all_samples.append({"text": " ".join(tokens), "label": " ".join(labels)})
-    return Dataset.from_list(all_samples)
+    frames = [pd.read_csv(os.path.join(data_folder, file))
+              for file in sorted(os.listdir(data_folder)) if file.endswith(".csv")]
+    df = pd.concat(frames, ignore_index=True)
+    # Normalise whitespace in both columns
+    df = pd.DataFrame({"text": df["text"].str.split().str.join(" "),
+                       "label": df["label"].str.split().str.join(" ")})
+    return Dataset.from_pandas(df, preserve_index=False)
+
+
+def load_parquet_shards(shard_folder):
+    """Shards written by ``python -m data.generate``. The datasets library
+    converts them to an Arrow cache once and memory-maps it, so the rows
+    are never all held in Python."""
+    files = sorted(glob.glob(os.path.join(shard_folder, "*.parquet")))
+    return Dataset.from_parquet(files, columns=["text", "label"])
 
 
 # -------------------------------
 # Encode function
 # -------------------------------
-def encode_batch(example, tokenizer, label2id, max_length=128):
+def encode_batch(examples, tokenizer, label2id, max_length=MAX_LEN):
+    """Tokenize a batch of examples without padding; the data collator pads
+    each training batch to its own longest example instead."""
     encoding = tokenizer(
-        example["text"],
+        examples["text"],
         truncation=True,
-        padding="max_length",
         max_length=max_length,
         return_offsets_mapping=True,
         is_split_into_words=False
     )
 
-    word_labels = example["label"].split()
-    labels = []
-    word_idx = 0
-
-    for offset in encoding["offset_mapping"]:
-        if offset[0] == offset[1]:
-            labels.append(-100)
-        else:
-            if word_idx < len(word_labels):
-                labels.append(label2id.get(word_labels[word_idx], 0))
-                word_idx += 1
-            else:
-                labels.append(-100)
+    all_labels = []
+    for offsets, label in zip(encoding["offset_mapping"], examples["label"]):
+        word_labels = label.split()
+        labels = []
+        word_idx = 0
 
-    encoding["labels"] = labels
+        for offset in offsets:
+            if offset[0] == offset[1]:
+                labels.append(-100)
+            else:
+                if word_idx < len(word_labels):
+                    labels.append(label2id.get(word_labels[word_idx], 0))
+                    word_idx += 1
+                else:
+                    labels.append(-100)
+        all_labels.append(labels)
+
+    encoding["labels"] = all_labels
     del encoding["offset_mapping"]
     return encoding
 
 
+# -------------------------------
+# Throughput logging
+# -------------------------------
+class ThroughputCallback(TrainerCallback):
+    """Prints wall-clock time, steps/s and samples/s for every epoch."""
+
+    def on_epoch_begin(self, args, state, control, **kwargs):
+        self.t0 = time.perf_counter()
+        self.step0 = state.global_step
+
+    def on_epoch_end(self, args, state, control, **kwargs):
+        seconds = time.perf_counter() - self.t0
+        steps = state.global_step - self.step0
+        samples = steps * args.per_device_train_batch_size * max(1, args.n_gpu)
+        print(f"⏱️ Epoch {state.epoch:.0f}: {seconds:.1f}s, {steps / seconds:.2f} steps/s, "
+              f"~{samples / seconds:.1f} samples/s")
+
 
 # -------------------------------
 # Training
@@ -77,10 +108,11 @@ def train(dataset):
         label2id=LABEL2ID
     )
 
-    encoded_dataset = dataset.map(lambda x: encode_batch(x, tokenizer, LABEL2ID), batched=False)
+    encoded_dataset = dataset.map(lambda x: encode_batch(x, tokenizer, LABEL2ID), batched=True,
+                                  remove_columns=dataset.column_names)
 
-    # set torch format
-    encoded_dataset.set_format(type="torch", columns=["input_ids", "attention_mask", "labels"])
+    # Pads input_ids/attention_mask with the tokenizer and labels with -100
+    collator = DataCollatorForTokenClassification(tokenizer)
 
     args = TrainingArguments(
         output_dir=OUTPUT_DIR,
@@ -92,13 +124,17 @@ def train(dataset):
         save_total_limit=2,
         logging_dir=f'{OUTPUT_DIR}/logs',
         logging_steps=10,
+        # Batches of similar length need little padding
+        group_by_length=True,
     )
 
     trainer = Trainer(
         model=model,
         args=args,
         train_dataset=encoded_dataset,
-        tokenizer=tokenizer
+        tokenizer=tokenizer,
+        data_collator=collator,
+        callbacks=[ThroughputCallback()],
     )
 
     trainer.train()
@@ -111,6 +147,13 @@ def train(dataset):
 # Run
 # ----------------------------
 if __name__ == "__main__":
-    data_folder = os.path.join(os.path.dirname(__file__), "..", "data")
-    dataset = load_csv_folder(data_folder)
+    ap = argparse.ArgumentParser(description="Fine-tune DistilBERT on the synthetic PII data.")
+    ap.add_argument("--shards", help="folder of Parquet shards from python -m data.generate "
+                                     "(default: the CSV files in data/)")
+    args = ap.parse_args()
+    if args.shards:
+        dataset = load_parquet_shards(args.shards)
+    else:
+        data_folder = os.path.join(os.path.dirname(__file__), "..", "data")
+        dataset = load_csv_folder(data_folder)
     train(dataset)
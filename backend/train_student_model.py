@@ -0,0 +1,281 @@
+"""Distil the base NER and the fine-tuned DistilBERT into one student model.
+
+Usage (from the repository root):
+    python -m backend.train_student_model --shards data/shards --texts extra.txt
+    PII_STUDENT_MODEL=backend/student_model uvicorn backend.app:app --port 3000
+
+The student covers the labels of both models (PERSON, GPE and ORG from
+bert-base-NER, DATE, MONEY, BANK and ADDRESS from the DistilBERT), so
+serving it takes one forward pass per text instead of two.
+
+Training targets are per-token label distributions. The base NER's
+temperature-softened predictions give the PERSON/GPE/ORG part. The
+synthetic data/ sentences give the DATE/MONEY/BANK/ADDRESS part from their
+labels. Lines of --texts have no labels, so the DistilBERT's predictions
+stand in for them there. The two parts are combined as independent
+experts: a token is O only if both say O.
+"""
+import argparse
+import os
+import re
+
+import torch
+from datasets import Dataset, concatenate_datasets
+from transformers import (AutoTokenizer, AutoModelForTokenClassification, TrainingArguments, Trainer)
+
+from . import config
+from .inference import PIIModel
+from .loading import resolve_model
+from .train_distil_model import (LABEL_LIST as DISTIL_LABEL_LIST, MAX_LEN, ThroughputCallback,
+                                 load_csv_folder, load_parquet_shards)
+
+# -------------------------------
+# Config
+# -------------------------------
+# Cased, like the base NER: capitalisation matters for names
+MODEL_NAME = "distilbert-base-cased"
+OUTPUT_DIR = "backend/student_model"
+BATCH_SIZE = 16
+EPOCHS = 3
+TEMPERATURE = 2.0
+NER_ENTITIES = ["PERSON", "GPE", "ORG"]
+DISTIL_ENTITIES = [l[2:] for l in DISTIL_LABEL_LIST if l.startswith("B-")]
+LABEL_LIST = ["O"] + [f"{p}-{e}" for e in NER_ENTITIES + DISTIL_ENTITIES for p in ("B", "I")]
+LABEL2ID = {l: i for i, l in enumerate(LABEL_LIST)}
+ID2LABEL = {i: l for i, l in enumerate(LABEL_LIST)}
+NER_IDS = [LABEL2ID[l] for l in LABEL_LIST if l[2:] in NER_ENTITIES]
+DISTIL_IDS = [LABEL2ID[l] for l in LABEL_LIST if l[2:] in DISTIL_ENTITIES]
+# Index of the I- label for every label (O and I- map to themselves)
+TO_INSIDE = [LABEL2ID.get("I-" + l[2:], i) for i, l in enumerate(LABEL_LIST)]
+
+
+# -------------------------------
+# Teachers
+# -------------------------------
+class Teacher:
+    """A token classifier whose predictions are mapped onto the student's
+    labels (bert-base-NER's PER/LOC/MISC become PERSON/GPE/ORG as in
+    PIIModel)."""
+
+    def __init__(self, model_id, temperature):
+        path = resolve_model(model_id, config.MODEL_DIR)
+        self.tok = AutoTokenizer.from_pretrained(path, use_fast=True)
+        self.model = AutoModelForTokenClassification.from_pretrained(path).eval()
+        self.temperature = temperature
+        self.to_student = torch.zeros(len(self.model.config.id2label), len(LABEL_LIST))
+        for i, label in self.model.config.id2label.items():
+            if label != "O":
+                label = f"{label[:2]}{PIIModel.ML_LABELS.get(label[2:], label[2:])}"
+            if label not in LABEL2ID:
+                raise ValueError(f"{model_id} predicts {label!r}, which the student does not have")
+            self.to_student[int(i), LABEL2ID[label]] = 1.0
+
+    @torch.no_grad()
+    def predict(self, texts):
+        """Student-label distributions for every token of ``texts``, with the
+        character offsets of those tokens."""
+        enc = self.tok(texts, return_offsets_mapping=True, return_tensors="pt", truncation=True,
+                       padding=True, max_length=PIIModel.max_window(self.tok, self.model))
+        offsets = enc.pop("offset_mapping")
+        logits = self.model(**enc).logits
+        probs = torch.softmax(logits / self.temperature, dim=-1) @ self.to_student
+        return probs, offsets
+
+
+def align(text_len, teacher_probs, teacher_offsets, student_offsets):
+    """Teacher distribution for every student token: that of the teacher
+    token its first character belongs to. A student token starting inside a
+    teacher token continues that token's entity, so B- mass moves to I-."""
+    owner = [-1] * text_len
+    starts = set()
+    for j, (s, e) in enumerate(teacher_offsets.tolist()):
+        if e > s:
+            owner[s:e] = [j] * (e - s)
+            starts.add(s)
+    out = torch.zeros(len(student_offsets), len(LABEL_LIST))
+    for k, (s, e) in enumerate(student_offsets):
+        if e <= s:
+            continue  # special token: no target
+        j = owner[s] if s < text_len else -1
+        if j < 0:
+            out[k, LABEL2ID["O"]] = 1.0  # beyond the teacher's context
+            continue
+        probs = teacher_probs[j]
+        if s not in starts:
+            probs = torch.zeros_like(probs).index_add_(0, torch.tensor(TO_INSIDE), probs)
+        out[k] = probs
+    return out
+
+
+def gold_targets(text, label, student_offsets):
+    """One-hot targets from the whitespace-word labels of a synthetic
+    sentence; later tokens of a word get the I- label of that word."""
+    words = [(m.start(), m.end()) for m in re.finditer(r"\S+", text)]
+    tags = label.split()
+    out = torch.zeros(len(student_offsets), len(LABEL_LIST))
+    w = 0
+    for k, (s, e) in enumerate(student_offsets):
+        if e <= s:
+            continue
+        while w < len(words) and words[w][1] <= s:
+            w += 1
+        i = LABEL2ID.get(tags[w], 0) if w < len(tags) else 0
+        out[k, i if w < len(words) and s == words[w][0] else TO_INSIDE[i]] = 1.0
+    return out
+
+
+def combine(ner, distil):
+    """Independent experts over disjoint entity sets: the token is O only if
+    both say so, and one expert's entity needs the other to say O."""
+    o = LABEL2ID["O"]
+    out = torch.zeros_like(ner)
+    out[:, NER_IDS] = ner[:, NER_IDS] * distil[:, o:o + 1]
+    out[:, DISTIL_IDS] = distil[:, DISTIL_IDS] * ner[:, o:o + 1]
+    out[:, o] = ner[:, o] * distil[:, o]
+    total = out.sum(dim=-1, keepdim=True)
+    # Special tokens have all-zero rows and stay that way (no loss)
+    return out / total.clamp_min(1e-12) * (ner.sum(dim=-1, keepdim=True) > 0)
+
+
+# -------------------------------
+# Encode function
+# -------------------------------
+def encode_batch(examples, tokenizer, ner_teacher, distil_teacher=None, max_length=MAX_LEN):
+    """Tokenize for the student and attach ``soft_labels``: one target
+    distribution per token. Rows with a "label" use it for the
+    DATE/MONEY/BANK/ADDRESS part; rows without one use ``distil_teacher``."""
+    texts = examples["text"]
+    encoding = tokenizer(texts, truncation=True, max_length=max_length, return_offsets_mapping=True)
+    ner_probs, ner_offsets = ner_teacher.predict(texts)
+    labels = examples.get("label") or [None] * len(texts)
+    if distil_teacher is not None and any(label is None for label in labels):
+        distil_probs, distil_offsets = distil_teacher.predict(texts)
+
+    soft = []
+    for r, (text, label, offsets) in enumerate(zip(texts, labels, encoding["offset_mapping"])):
+        ner = align(len(text), ner_probs[r], ner_offsets[r], offsets)
+        if label is not None:
+            distil = gold_targets(text, label, offsets)
+        else:
+            distil = align(len(text), distil_probs[r], distil_offsets[r], offsets)
+        soft.append(combine(ner, distil).numpy())
+
+    encoding["soft_labels"] = soft
+    del encoding["offset_mapping"]
+    return encoding
+
+
+class SoftLabelCollator:
+    """Pads input_ids/attention_mask with the tokenizer and the soft labels
+    with all-zero rows, which the loss ignores."""
+
+    def __init__(self, tokenizer):
+        self.tokenizer = tokenizer
+
+    def __call__(self, features):
+        soft = [f.pop("soft_labels") for f in features]
+        batch = self.tokenizer.pad(features, return_tensors="pt")
+        targets = torch.zeros(len(soft), batch["input_ids"].shape[1], len(LABEL_LIST))
+        for i, rows in enumerate(soft):
+            targets[i, :len(rows)] = torch.tensor(rows, dtype=torch.float)
+        batch["soft_labels"] = targets
+        return batch
+
+
+# -------------------------------
+# Training
+# -------------------------------
+class DistillationTrainer(Trainer):
+    """Cross-entropy against the soft labels at ``temperature``, scaled by
+    its square so that gradients keep their size."""
+
+    def __init__(self, *args, temperature=TEMPERATURE, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.temperature = temperature
+
+    def compute_loss(self, model, inputs, return_outputs=False, **kwargs):
+        targets = inputs.pop("soft_labels")
+        outputs = model(**inputs)
+        log_probs = torch.log_softmax(outputs.logits / self.temperature, dim=-1)
+        per_token = -(targets * log_probs).sum(dim=-1)
+        mask = targets.sum(dim=-1) > 0
+        loss = per_token[mask].mean() * self.temperature ** 2
+        return (loss, outputs) if return_outputs else loss
+
+
+def train(dataset, base_model=MODEL_NAME, output_dir=OUTPUT_DIR, temperature=TEMPERATURE, epochs=EPOCHS):
+    tokenizer = AutoTokenizer.from_pretrained(base_model, use_fast=True)
+    model = AutoModelForTokenClassification.from_pretrained(
+        base_model,
+        num_labels=len(LABEL_LIST),
+        id2label=ID2LABEL,
+        label2id=LABEL2ID,
+        # A token classifier with other labels can be the starting point too
+        ignore_mismatched_sizes=True,
+    )
+
+    ner_teacher = Teacher(config.NER_MODEL, temperature)
+    # Only rows without labels (from --texts) need the DistilBERT
+    distil_teacher = Teacher(config.DISTIL_MODEL, temperature) if None in dataset.unique("label") else None
+    # The teachers run here, once; the targets are cached with the dataset
+    max_length = min(MAX_LEN, PIIModel.max_window(tokenizer, model))
+    encoded_dataset = dataset.map(lambda x: encode_batch(x, tokenizer, ner_teacher, distil_teacher, max_length),
+                                  batched=True, batch_size=64, remove_columns=dataset.column_names)
+
+    args = TrainingArguments(
+        output_dir=output_dir,
+        save_strategy="epoch",
+        learning_rate=5e-5,
+        per_device_train_batch_size=BATCH_SIZE,
+        num_train_epochs=epochs,
+        weight_decay=0.01,
+        save_total_limit=2,
+        logging_dir=f'{output_dir}/logs',
+        logging_steps=10,
+        group_by_length=True,
+        # soft_labels is not a model argument; keep it for compute_loss
+        remove_unused_columns=False,
+    )
+
+    trainer = DistillationTrainer(
+        model=model,
+        args=args,
+        train_dataset=encoded_dataset,
+        tokenizer=tokenizer,
+        data_collator=SoftLabelCollator(tokenizer),
+        callbacks=[ThroughputCallback()],
+        temperature=temperature,
+    )
+
+    trainer.train()
+    model.save_pretrained(output_dir)
+    tokenizer.save_pretrained(output_dir)
+    print(f"✅ Student model saved to {output_dir}; serve it with PII_STUDENT_MODEL={output_dir}")
+
+
+def load_texts(path):
+    with open(path, encoding="utf-8") as f:
+        texts = [" ".join(line.split()) for line in f]
+    return Dataset.from_dict({"text": [t for t in texts if t], "label": [None] * sum(1 for t in texts if t)})
+
+
+# ----------------------------
+# Run
+# ----------------------------
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--shards", help="folder of Parquet shards from python -m data.generate "
+                                     "(default: the CSV files in data/)")
+    ap.add_argument("--texts", help="unlabelled text file, one document per line, labelled by both teachers")
+    ap.add_argument("--base-model", default=MODEL_NAME)
+    ap.add_argument("--output-dir", default=OUTPUT_DIR)
+    ap.add_argument("--temperature", type=float, default=TEMPERATURE)
+    ap.add_argument("--epochs", type=float, default=EPOCHS)
+    args = ap.parse_args()
+    if args.shards:
+        dataset = load_parquet_shards(args.shards)
+    else:
+        dataset = load_csv_folder(os.path.join(os.path.dirname(__file__), "..", "data"))
+    if args.texts:
+        dataset = concatenate_datasets([dataset, load_texts(args.texts).cast(dataset.features)])
+    train(dataset, args.base_model, args.output_dir, args.temperature, args.epochs)
@@ -0,0 +1,113 @@
+import json
+import re
+import secrets
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+class PlaceholderVault:
+    """Placeholder maps of redacted texts, looked up by a random token.
+
+    Entries expire ``ttl`` seconds after they were stored; beyond
+    ``max_entries`` the least recently used ones are dropped. They are kept
+    in memory, or with ``path`` set in a SQLite file instead, which every
+    process opening it shares (so a token issued by one worker can be
+    redeemed at another) and which survives restarts.
+    """
+
+    def __init__(self, max_entries=10000, ttl=3600.0, path=None):
+        self.max_entries = max(1, int(max_entries))
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self.path = path
+        self._connect()
+
+    def _connect(self):
+        self._lock = threading.Lock()
+        self._db = None
+        if self.path:
+            self._db = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+            # WAL lets the workers read while another one writes
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("CREATE TABLE IF NOT EXISTS vault "
+                             "(token TEXT PRIMARY KEY, expires REAL, used REAL, mapping TEXT)")
+            self._db.execute("CREATE INDEX IF NOT EXISTS vault_expires ON vault (expires)")
+            self._db.execute("CREATE INDEX IF NOT EXISTS vault_used ON vault (used)")
+            self._db.commit()
+
+    def after_fork(self):
+        """A forked child must not share the parent's SQLite connection."""
+        self._connect()
+
+    def put(self, mapping):
+        token = secrets.token_urlsafe(16)
+        if self._db is not None:
+            return self._put_db(token, mapping)
+        now = time.monotonic()
+        with self._lock:
+            self._entries[token] = (now + self.ttl, mapping, None)
+            # Entries are in LRU order, not expiry order; sweep the oldest
+            while self._entries:
+                oldest, (expires, _, _) = next(iter(self._entries.items()))
+                if len(self._entries) <= self.max_entries and expires > now:
+                    break
+                del self._entries[oldest]
+        return token
+
+    def get(self, token):
+        """Returns ``(mapping, pattern)`` for ``token``, or None once it has
+        expired or been evicted. ``pattern`` matches any placeholder."""
+        if self._db is not None:
+            return self._get_db(token)
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                return None
+            expires, mapping, pattern = entry
+            if expires <= time.monotonic():
+                del self._entries[token]
+                return None
+            if pattern is None:
+                pattern = placeholder_pattern(mapping)
+                self._entries[token] = (expires, mapping, pattern)
+            self._entries.move_to_end(token)
+            return mapping, pattern
+
+    # Wall-clock times, since the file outlives the process
+    def _put_db(self, token, mapping):
+        now = time.time()
+        with self._lock, self._db:
+            self._db.execute("INSERT INTO vault VALUES (?, ?, ?, ?)",
+                             (token, now + self.ttl, now, json.dumps(mapping)))
+            self._db.execute("DELETE FROM vault WHERE expires <= ?", (now,))
+            self._db.execute("DELETE FROM vault WHERE token IN "
+                             "(SELECT token FROM vault ORDER BY used DESC LIMIT -1 OFFSET ?)",
+                             (self.max_entries,))
+        return token
+
+    def _get_db(self, token):
+        now = time.time()
+        with self._lock, self._db:
+            row = self._db.execute("SELECT expires, mapping FROM vault WHERE token = ?", (token,)).fetchone()
+            if row is None:
+                return None
+            if row[0] <= now:
+                self._db.execute("DELETE FROM vault WHERE token = ?", (token,))
+                return None
+            self._db.execute("UPDATE vault SET used = ? WHERE token = ?", (now, token))
+        mapping = json.loads(row[1])
+        return mapping, placeholder_pattern(mapping)
+
+    def __len__(self):
+        if self._db is not None:
+            with self._lock:
+                return self._db.execute("SELECT COUNT(*) FROM vault").fetchone()[0]
+        return len(self._entries)
+
+
+def placeholder_pattern(mapping):
+    # Longest keys first so that Email_12 is not read as Email_1 + "2"
+    keys = sorted(mapping, key=len, reverse=True)
+    return re.compile("(?:" + "|".join(map(re.escape, keys)) + r")(?!\d)") if keys else None
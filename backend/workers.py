@@ -0,0 +1,122 @@
+import asyncio
+import multiprocessing as mp
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+import torch
+
+from . import metrics
+
+# Model owned by this process when running as a process-pool worker.
+_worker_model = None
+
+
+def default_torch_threads(workers):
+    """Split the machine's cores evenly between ``workers`` so that their
+    intra-op thread pools do not oversubscribe the CPU."""
+    return max(1, (os.cpu_count() or 1) // max(1, workers))
+
+
+def _init_worker(model_factory, torch_threads):
+    global _worker_model
+    torch.set_num_threads(torch_threads)
+    _worker_model = model_factory() if model_factory is not None else None
+
+
+def _call_model(method, *args):
+    return getattr(_worker_model, method)(*args)
+
+
+def _run_job(queue, enqueued, drain, fn, *args):
+    # The monotonic clock is shared by every process of the machine
+    metrics.QUEUE_SECONDS.observe(time.monotonic() - enqueued, queue)
+    result = fn(*args)
+    # Worker processes hand their metrics back to the server with each result
+    return (result, metrics.REGISTRY.drain()) if drain else result
+
+
+class WorkerPool:
+    """Bounded pool that runs blocking work off the asyncio event loop.
+
+    ``kind="thread"`` shares ``model`` between threads of this process;
+    ``kind="process"`` builds one model per worker with ``model_factory``.
+    Models are built by ``start()`` (in the background, or on the first
+    call) unless a ready ``model`` is given.
+    At most ``max_pending`` jobs are queued or running at once; further
+    callers wait for a free slot instead of piling onto the executor.
+    """
+
+    def __init__(self, kind="thread", workers=1, torch_threads=None,
+                 max_pending=64, model=None, model_factory=None, name="inference"):
+        if kind not in ("thread", "process"):
+            raise ValueError(f"Unknown worker pool kind: {kind!r}")
+        self.kind = kind
+        self.name = name
+        self.workers = max(1, int(workers))
+        self.torch_threads = torch_threads or default_torch_threads(self.workers)
+        self.max_pending = max(1, int(max_pending))
+        self.model = model
+        self.model_factory = model_factory
+        self._limit = None
+        self._starting = None
+
+        if kind == "thread":
+            if model is not None or model_factory is not None:
+                torch.set_num_threads(self.torch_threads)
+            self._executor = ThreadPoolExecutor(max_workers=self.workers)
+        else:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=mp.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(model_factory, self.torch_threads),
+            )
+
+    async def run(self, fn, *args):
+        # The semaphore is created lazily so that it binds to the running loop.
+        if self._limit is None:
+            self._limit = asyncio.Semaphore(self.max_pending)
+        enqueued = time.monotonic()
+        drain = self.kind == "process"
+        async with self._limit:
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(self._executor, _run_job, self.name,
+                                                enqueued, drain, fn, *args)
+        if drain:
+            result, recorded = result
+            metrics.REGISTRY.merge(recorded)
+        return result
+
+    def start(self):
+        """Begin building the models; returns the task doing it."""
+        if self._starting is None:
+            self._starting = asyncio.ensure_future(self._start())
+        return self._starting
+
+    async def _start(self):
+        if self.kind == "thread":
+            if self.model is None and self.model_factory is not None:
+                self.model = await self.run(self.model_factory)
+        else:
+            # Workers build their model in the initializer; make them all start
+            await asyncio.gather(*(self.run(_call_model, "status") for _ in range(self.workers)))
+
+    async def status(self):
+        if self._starting is None or not self._starting.done():
+            return {"ready": False, "state": "starting"}
+        if self._starting.exception() is not None:
+            return {"ready": False, "state": "failed", "error": str(self._starting.exception())}
+        if self.kind == "thread":
+            return self.model.status()
+        # Reports whichever worker takes the call
+        return {**await self.run(_call_model, "status"), "workers": self.workers}
+
+    async def call_model(self, method, *args):
+        await asyncio.shield(self.start())
+        if self.kind == "thread":
+            return await self.run(getattr(self.model, method), *args)
+        return await self.run(_call_model, method, *args)
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
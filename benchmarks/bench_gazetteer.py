@@ -0,0 +1,102 @@
+"""Build gazetteer indexes from synthetic deny-lists of growing size and time them.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_gazetteer --entries 10000,100000,1000000 --docs 200
+
+For each size the lists hold employee names, customer account numbers and
+project codes in equal parts. The report shows the build time, the size of
+the index file, how long loading (mapping) it takes, and the scan rate over
+--docs documents of prose with a few list entries planted in each, written
+with other case and spacing. "found" counts the planted entries that were
+found; it should equal "planted". Scan time should not grow with the lists.
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from backend.gazetteer import Gazetteer, build, write_index
+from benchmarks.bench_regex import PROSE
+
+SYLLABLES = ["an", "bel", "cor", "da", "el", "fin", "gar", "hol", "is", "jun", "ka", "lim",
+             "mor", "nel", "or", "pen", "qua", "ros", "sun", "tan", "ul", "ver", "win", "yao"]
+
+
+def word(rnd, parts):
+    return "".join(rnd.choice(SYLLABLES) for _ in range(parts)).capitalize()
+
+
+def make_lists(entries, seed=0):
+    rnd = random.Random(seed)
+    n = entries // 3
+    return [
+        ("EMPLOYEE", [f"{word(rnd, 2)} {word(rnd, 3)}" for _ in range(n)]),
+        ("ACCOUNT", [f"ACC-{rnd.randrange(10**9):09d}" for _ in range(n)]),
+        ("PROJECT", [f"Project {word(rnd, 3)} {rnd.randint(1, 99)}" for _ in range(entries - 2 * n)]),
+    ]
+
+
+def vary(entry, rnd):
+    """The entry with its case changed and its spacing stretched."""
+    entry = entry.upper() if rnd.random() < 0.5 else entry.lower()
+    return entry.replace(" ", rnd.choice([" ", "  ", "\n"]))
+
+
+def build_corpus(lists, docs, seed=1):
+    """Documents and, for each, the (start, end, label) of its planted entries."""
+    rnd = random.Random(seed)
+    flat = [(label, entry) for label, values in lists for entry in values]
+    corpus = []
+    for _ in range(docs):
+        sentences = [rnd.choice(PROSE) for _ in range(20)]
+        for _ in range(3):
+            label, entry = rnd.choice(flat)
+            sentences.insert(rnd.randrange(len(sentences) + 1), (label, vary(entry, rnd)))
+        text, planted = "", []
+        for sentence in sentences:
+            if isinstance(sentence, tuple):
+                label, entry = sentence
+                text += "Ref "
+                planted.append((len(text), len(text) + len(entry), label))
+                sentence = entry + "."
+            text += sentence + " "
+        corpus.append((text, planted))
+    return corpus
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--entries", default="10000,100000,1000000", help="list sizes to build")
+    ap.add_argument("--docs", type=int, default=200)
+    args = ap.parse_args()
+
+    print(f"{'entries':>9} {'build s':>8} {'index MB':>9} {'load ms':>8} {'docs/s':>8} {'MB/s':>6} "
+          f"{'found':>6} {'planted':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for entries in (int(e) for e in args.entries.split(",")):
+            lists = make_lists(entries)
+            path = os.path.join(tmp, f"{entries}.idx")
+            t0 = time.perf_counter()
+            arrays, header = build(lists)
+            write_index(path, arrays, header)
+            t_build = time.perf_counter() - t0
+
+            t0 = time.perf_counter()
+            gazetteer = Gazetteer(path)
+            t_load = time.perf_counter() - t0
+
+            corpus = build_corpus(lists, args.docs)
+            t0 = time.perf_counter()
+            found = [gazetteer.scan(text) for text, _ in corpus]
+            t_scan = time.perf_counter() - t0
+            planted = sum(len(p) for _, p in corpus)
+            hits = sum(len(set(p) & {(s.start, s.end, s.label) for s in spans})
+                       for (_, p), spans in zip(corpus, found))
+            chars = sum(len(text) for text, _ in corpus)
+            print(f"{entries:>9,} {t_build:>8.1f} {os.path.getsize(path) / 2**20:>9.1f} {t_load * 1000:>8.2f} "
+                  f"{len(corpus) / t_scan:>8.0f} {chars / t_scan / 2**20:>6.2f} {hits:>6} {planted:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Compare the sequential per-pattern regex scan with RegexScanner.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_regex --size-mb 2 --pii-every 40
+
+The corpus is prose with one PII-bearing line every ``--pii-every`` lines.
+For k = 1..12 rules, both scanners run the first k rules of
+PIIModel.SCANNER; the table shows how their cost grows as rules are added.
+"""
+import argparse
+import random
+import time
+
+from backend.inference import PIIModel
+from backend.regex_scanner import RegexScanner
+
+PROSE = [
+    "Please find attached the minutes from our last meeting.",
+    "The committee agreed to revisit the proposal next quarter.",
+    "Let me know if you have any questions about the draft.",
+    "We will circulate the revised agenda before the workshop.",
+    "Thanks again for taking the time to review the document.",
+]
+PII = [
+    "Contact: hr@starforge-ent.com | +65 6789 1234",
+    "- NRIC: S9123456A, Passport No: E1234567A",
+    "- Date: 20 September 2025, vehicle SBA1234Z",
+    "- Total Contract Value: USD 500,000 (card 4111 1111 1111 1111)",
+    "- Address: 089322, server 10.0.0.12, see https://example.com/x @flipredact",
+]
+
+
+def build_corpus(size_mb, pii_every, seed=0):
+    rnd = random.Random(seed)
+    lines, size, target = [], 0, int(size_mb * 1024 * 1024)
+    while size < target:
+        line = rnd.choice(PII) if len(lines) % pii_every == 0 else rnd.choice(PROSE)
+        lines.append(line)
+        size += len(line) + 1
+    return "\n".join(lines)
+
+
+def sequential_scan(rules, text):
+    spans = []
+    for label, pattern, _, _ in rules:
+        for m in pattern.finditer(text):
+            spans.append({"start": m.start(), "end": m.end(), "label": label,
+                          "score": 1.0, "word": m.group()})
+    return spans
+
+
+def best_of(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, out
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--size-mb", type=float, default=2.0)
+    ap.add_argument("--pii-every", type=int, default=40)
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    text = build_corpus(args.size_mb, args.pii_every)
+    rules = PIIModel.SCANNER.rules
+    print(f"corpus: {len(text):,} chars, one PII line every {args.pii_every} lines")
+    print(f"{'rules':>5} {'last rule':<14} {'sequential ms':>14} {'scanner ms':>11} {'speedup':>8}")
+    for k in range(1, len(rules) + 1):
+        scanner = RegexScanner(rules[:k])
+        t_seq, seq = best_of(lambda: sequential_scan(rules[:k], text), args.repeat)
+        t_scan, scan = best_of(lambda: scanner.scan(text), args.repeat)
+        assert seq == [s.to_dict() for s in scan], f"span mismatch with {k} rules"
+        print(f"{k:>5} {rules[k - 1][0]:<14} {t_seq * 1000:>14.1f} {t_scan * 1000:>11.1f} {t_seq / t_scan:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""Time each stage of PIIModel.predict by input length.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_stages --lengths 200 2000 20000 --docs 20
+    python -m benchmarks.bench_stages --save-baseline benchmarks/baseline.json
+    python -m benchmarks.bench_stages --check-baseline benchmarks/baseline.json --threshold 0.25
+
+Documents are built from the sentence generators in data/ (addresses,
+bank accounts, dates, money) with a fixed seed, in paragraphs of a few
+sentences, up to each target length in characters. For every length the
+stages regex_spans, ml_spans, distil_spans, merge_spans and group_spans
+(plus the whole predict, with the cache off) are timed separately; the
+table shows p50/p95/p99 latency, throughput in characters per second and
+the peak Python heap while the stage runs (tracemalloc; tensor buffers
+are not included, the process peak RSS is printed at the end).
+
+--check-baseline exits with status 1 if any stage's p50 is more than
+--threshold (a fraction) slower than in the saved baseline. Baselines are
+only comparable on the same machine and settings.
+"""
+import argparse
+import json
+import random
+import sys
+import time
+import tracemalloc
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from backend.inference import PIIModel
+from data import address, bank_account, date, money
+
+GENERATORS = [address, bank_account, date, money]
+STAGES = ["regex", "ml", "distil", "merge", "group", "predict"]
+
+
+def build_document(length, rnd):
+    paragraphs, size = [], 0
+    while size < length:
+        sentences = []
+        for _ in range(rnd.randint(2, 6)):
+            sentences.append(rnd.choice(GENERATORS).generate(1, rnd)[0][0] + ".")
+        paragraphs.append(" ".join(sentences))
+        size += len(paragraphs[-1]) + 2
+    return "\n\n".join(paragraphs)[:length]
+
+
+def build_corpus(length, docs, seed=0):
+    rnd = random.Random(seed)
+    return [build_document(length, rnd) for _ in range(docs)]
+
+
+def stage_calls(model, text):
+    """One callable per stage; later stages get the earlier stages' output."""
+    regex = model.regex_spans(text)
+    ml = model.ml_spans(text)
+    distil = model.distil_spans(text)
+    merged = model.merge_spans(regex + ml + distil)
+    return {
+        "regex": lambda: model.regex_spans(text),
+        "ml": lambda: model.ml_spans(text),
+        "distil": lambda: model.distil_spans(text),
+        "merge": lambda: model.merge_spans(regex + ml + distil),
+        "group": lambda: model.group_spans(merged),
+        "predict": lambda: model.predict(text),
+    }
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q / 100 * (len(values) - 1))))]
+
+
+def measure(model, corpus, repeat, warmup):
+    times = {stage: [] for stage in STAGES}
+    peaks = {stage: 0 for stage in STAGES}
+    for text in corpus:
+        calls = stage_calls(model, text)
+        for stage, fn in calls.items():
+            for _ in range(warmup):
+                fn()
+            for _ in range(repeat):
+                t0 = time.perf_counter()
+                fn()
+                times[stage].append(time.perf_counter() - t0)
+            tracemalloc.start()
+            fn()
+            peaks[stage] = max(peaks[stage], tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+
+    chars = sum(len(text) for text in corpus) * repeat
+    return {stage: {"p50_ms": percentile(t, 50) * 1000, "p95_ms": percentile(t, 95) * 1000,
+                    "p99_ms": percentile(t, 99) * 1000, "chars_per_s": chars / sum(t),
+                    "docs_per_s": len(t) / sum(t), "peak_kb": peaks[stage] / 1024}
+            for stage, t in times.items()}
+
+
+def check(results, baseline, threshold):
+    failures = []
+    for length, stages in baseline["results"].items():
+        for stage, old in stages.items():
+            new = results.get(length, {}).get(stage)
+            if new is not None and new["p50_ms"] > old["p50_ms"] * (1 + threshold):
+                failures.append(f"{stage} @ {length} chars: p50 {old['p50_ms']:.2f} -> {new['p50_ms']:.2f} ms")
+    return failures
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--lengths", type=int, nargs="+", default=[200, 2000, 20000])
+    ap.add_argument("--docs", type=int, default=10, help="documents per length")
+    ap.add_argument("--repeat", type=int, default=3, help="timed runs per document and stage")
+    ap.add_argument("--warmup", type=int, default=1)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--save-baseline", metavar="PATH")
+    ap.add_argument("--check-baseline", metavar="PATH")
+    ap.add_argument("--threshold", type=float, default=0.2)
+    args = ap.parse_args()
+
+    model = PIIModel(cache_entries=0, parallel=False)
+    results = {}
+    print(f"{'chars':>6} {'stage':<8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} "
+          f"{'chars/s':>11} {'docs/s':>8} {'peak KB':>8}")
+    for length in args.lengths:
+        corpus = build_corpus(length, args.docs, args.seed)
+        results[str(length)] = measure(model, corpus, args.repeat, args.warmup)
+        for stage, r in results[str(length)].items():
+            print(f"{length:>6} {stage:<8} {r['p50_ms']:>9.2f} {r['p95_ms']:>9.2f} {r['p99_ms']:>9.2f} "
+                  f"{r['chars_per_s']:>11,.0f} {r['docs_per_s']:>8.1f} {r['peak_kb']:>8.0f}")
+    if resource is not None:
+        print(f"peak RSS: {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.0f} MB")
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump({"args": vars(args), "results": results}, f, indent=2)
+        print(f"✅ Baseline saved to {args.save_baseline}")
+    if args.check_baseline:
+        with open(args.check_baseline) as f:
+            failures = check(results, json.load(f), args.threshold)
+        for failure in failures:
+            print(f"⚠️ Regression: {failure}")
+        if failures:
+            sys.exit(1)
+        print(f"✅ No stage is more than {args.threshold:.0%} slower than {args.check_baseline}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""Compare the unified student model with the two-model setup.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_student --student backend/student_model --docs 200
+    python -m benchmarks.bench_student --student backend/student_model --gold labelled.jsonl
+
+Both setups run the model detectors only (no regex), with the cache off.
+The report shows per-document latency (p50/p95) and docs/s for each, and
+per-label F1 on exact (start, end, label) span matches.
+
+Without --gold, the documents are sentences from the generators in data/
+with a fixed seed. Their labels score DATE, MONEY, BANK and ADDRESS for
+both setups. They have no PERSON/GPE/ORG labels, so for those the student
+is scored against the two-model setup's own spans (agreement with
+bert-base-NER). A --gold file is JSONL with "text" and "spans" as
+[start, end, label] lists; then every label is scored against it.
+"""
+import argparse
+import json
+import random
+import re
+import time
+
+from backend.inference import PIIModel
+from data import address, bank_account, date, money
+from benchmarks.bench_stages import percentile
+
+GENERATORS = [address, bank_account, date, money]
+DETECTORS = ["ner", "distil"]
+
+
+# -------------------------------
+# Documents
+# -------------------------------
+def word_spans(text, label):
+    """Character spans of the B-/I- runs in whitespace-word labels."""
+    spans = []
+    for m, tag in zip(re.finditer(r"\S+", text), label.split()):
+        if tag.startswith("I-") and spans and spans[-1][2] == tag[2:] and spans[-1][3]:
+            spans[-1][1] = m.end()
+            continue
+        if tag == "O":
+            if spans:
+                spans[-1][3] = False
+            continue
+        spans.append([m.start(), m.end(), tag[2:], True])
+    return [(s, e, l) for s, e, l, _ in spans]
+
+
+def build_corpus(docs, seed=0):
+    rnd = random.Random(seed)
+    corpus = []
+    for _ in range(docs):
+        parts, gold, pos = [], [], 0
+        for _ in range(rnd.randint(2, 6)):
+            text, label = rnd.choice(GENERATORS).generate(1, rnd)[0]
+            gold += [(pos + s, pos + e, l) for s, e, l in word_spans(text, label)]
+            parts.append(text + ".")
+            pos += len(text) + 2
+        corpus.append((" ".join(parts), gold))
+    return corpus
+
+
+def load_gold(path):
+    with open(path, encoding="utf-8") as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    return [(r["text"], [tuple(s) for s in r["spans"]]) for r in records]
+
+
+# -------------------------------
+# Measurement
+# -------------------------------
+def run(model, corpus):
+    """Spans per document as (start, end, label) sets, and per-document seconds."""
+    found, times = [], []
+    for text, _ in corpus:
+        t0 = time.perf_counter()
+        out = model.predict_batch([text], detectors=DETECTORS, output="columnar")[0]
+        times.append(time.perf_counter() - t0)
+        found.append({(s, e, out["labels"][i]) for s, e, i in zip(out["start"], out["end"], out["label_id"])})
+    return found, times
+
+
+def f1(predicted, reference, label):
+    tp = fp = fn = 0
+    for pred, ref in zip(predicted, reference):
+        pred = {s for s in pred if s[2] == label}
+        ref = {s for s in ref if s[2] == label}
+        tp, fp, fn = tp + len(pred & ref), fp + len(pred - ref), fn + len(ref - pred)
+    return (2 * tp / (2 * tp + fp + fn) if tp + fp + fn else None), tp + fn
+
+
+def fmt(value):
+    return f"{value:.3f}" if value is not None else "-"
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--student", required=True, help="student model directory or Hub id")
+    ap.add_argument("--gold", help="labelled JSONL to score against (default: synthetic sentences)")
+    ap.add_argument("--docs", type=int, default=200)
+    ap.add_argument("--seed", type=int, default=1, help="use a seed the student was not trained on")
+    args = ap.parse_args()
+
+    corpus = load_gold(args.gold) if args.gold else build_corpus(args.docs, args.seed)
+    gold = [set(spans) for _, spans in corpus]
+    two_model = PIIModel(cache_entries=0, parallel=False, student_model=None)
+    student = PIIModel(cache_entries=0, parallel=False, student_model=args.student)
+    two_found, two_times = run(two_model, corpus)
+    student_found, student_times = run(student, corpus)
+
+    print(f"{'setup':<10} {'p50 ms':>9} {'p95 ms':>9} {'docs/s':>8}")
+    for name, times in (("two-model", two_times), ("student", student_times)):
+        print(f"{name:<10} {percentile(times, 50) * 1000:>9.2f} {percentile(times, 95) * 1000:>9.2f} "
+              f"{len(times) / sum(times):>8.1f}")
+    print(f"speed-up: {sum(two_times) / sum(student_times):.2f}x")
+
+    print(f"\n{'label':<9} {'support':>8} {'F1 two-model':>13} {'F1 student':>11}  reference")
+    produces = two_model.detector_labels()
+    gold_labels = {l for spans in gold for _, _, l in spans}
+    for label in sorted(produces["ner"] | produces["distil"] | gold_labels):
+        if args.gold or label in gold_labels:
+            two, support = f1(two_found, gold, label)
+            ours, _ = f1(student_found, gold, label)
+            reference = "gold labels"
+        else:
+            two = None
+            ours, support = f1(student_found, two_found, label)
+            reference = "two-model spans"
+        print(f"{label:<9} {support:>8} {fmt(two):>13} {fmt(ours):>11}  {reference}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""Fuzz the regex scan against re and check it stays linear on worst-case input.
+
+Usage (from the repository root):
+    python -m benchmarks.fuzz_regex --fuzz 20000 --sizes 10000,20000,40000,80000
+    python -m benchmarks.fuzz_regex --legacy --sizes 2000,4000,8000
+
+First, --fuzz random texts made of PII-like fragments (digits, separators,
+currencies, "@", month names, ...) and short versions of the inputs below
+are scanned with PIIModel.SCANNER and with each rule's original pattern run
+by re.finditer over the whole text; every difference is printed.
+
+Then every rule is timed on its own over each worst-case input (long runs
+of digits, digit groups, address characters, ...) at the --sizes lengths.
+The growth exponent is the least-squares slope of log(time) against
+log(length): about 1 for a linear scan, 2 for one that backtracks
+quadratically. The table shows each rule's worst input.
+The run fails if the scans differ or an exponent is above --max-exponent.
+--legacy times the original patterns instead, to see what the scanner avoids.
+"""
+import argparse
+import math
+import random
+import sys
+
+from backend.inference import PIIModel
+from backend.regex_scanner import RegexScanner
+from benchmarks.bench_regex import best_of
+
+FRAGMENTS = [
+    "lorem ipsum dolor sit amet ", "Contact: ", " ", "  ", "\n", "\t", "-", ".", ",", "/", ":", "+",
+    "USD", "usd", "SGD", "$", "€", "£", "dollars", "bucks", "cent", "of", "th", "st", "Jan", "August",
+    "S", "s", "E", "e", "T", "A", "Z", "SA", "SBA", "a", "x", "_", "%", "@", "http://", "https://",
+    "+65", "٣", "1", "2", "9", "12", "123", "1234", "8123", "2025", "99999", "1234567",
+    ",000", ",123", ".00", ".5", "4111 1111 1111 1111", "10.0.0.1", "hr@a-b.com", ".com", "@flip.redact",
+]
+
+# (name, prefix, repeated unit, suffix)
+WORST_CASES = [
+    ("digits", "", "1", ""),
+    ("spaced digits", "", "1 ", ""),
+    ("dashed digits", "", "1-", ""),
+    ("dotted digits", "", "1.", ""),
+    ("slashed digits", "", "1/", ""),
+    ("digit groups", "1", ",111", ""),
+    ("long digit groups", "", "1111,", ""),
+    ("digits then spaces", "1", " ", "x"),
+    ("currency digits", "$", "1", ""),
+    ("currencies", "", "$1", ""),
+    ("address characters", "", "a", " @"),
+    ("dashed domain", "x@", "a-", ""),
+    ("dotted domain", "x@", "a.", ""),
+    ("at signs", "", "a@", ""),
+    ("handle", "@", "a", ""),
+    ("url", "http://", "a", ""),
+    ("day of", "", "1 of ", ""),
+    ("ordinals", "", "1st ", ""),
+    ("month names", "", "Jan ", ""),
+    ("plates", "", "SA1", ""),
+]
+
+
+def worst_case(prefix, unit, suffix, size):
+    return prefix + unit * max(1, (size - len(prefix) - len(suffix)) // len(unit)) + suffix
+
+
+def random_text(rnd, fragments):
+    return "".join(rnd.choice(FRAGMENTS) for _ in range(fragments))
+
+
+# -------------------------------
+# Same matches as re
+# -------------------------------
+def original(pattern):
+    return getattr(pattern, "regex", pattern)
+
+
+def reference_scan(rules, text):
+    return [(m.start(), m.end(), label) for label, pattern, _, _ in rules for m in original(pattern).finditer(text)]
+
+
+def fuzz(texts):
+    rules, failures = PIIModel.SCANNER.rules, 0
+    for text in texts:
+        expected = reference_scan(rules, text)
+        got = [(s.start, s.end, s.label) for s in PIIModel.SCANNER.scan(text)]
+        if got != expected:
+            failures += 1
+            print(f"⚠️ Mismatch on {text!r}\n   re:      {expected}\n   scanner: {got}")
+            if failures >= 10:
+                break
+    return failures
+
+
+# -------------------------------
+# Growth with input length
+# -------------------------------
+def slope(xs, ys):
+    """Least-squares slope of ys against xs."""
+    mx, my = sum(xs) / len(xs), sum(ys) / len(ys)
+    return sum((x - mx) * (y - my) for x, y in zip(xs, ys)) / sum((x - mx) ** 2 for x in xs)
+
+
+def growth(rule, sizes, repeat, legacy):
+    """(exponent, ms at the largest size, input name) of the rule's worst input."""
+    label, pattern, hint, near_digits = rule
+    scanner = RegexScanner([(label, original(pattern) if legacy else pattern, hint, near_digits)])
+    worst = None
+    for name, prefix, unit, suffix in WORST_CASES:
+        times = [best_of(lambda: scanner.scan(worst_case(prefix, unit, suffix, size)), repeat)[0]
+                 for size in sizes]
+        # Clamp to a microsecond so that scans too quick to time do not count as growth
+        exponent = slope([math.log(size) for size in sizes], [math.log(max(t, 1e-6)) for t in times])
+        if worst is None or exponent > worst[0]:
+            worst = (exponent, times[-1] * 1000, name)
+    return worst
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--fuzz", type=int, default=20000, help="random texts to compare with re")
+    ap.add_argument("--sizes", default="10000,20000,40000,80000", help="input lengths in characters")
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--max-exponent", type=float, default=1.5)
+    ap.add_argument("--legacy", action="store_true", help="time the original patterns instead")
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+
+    sizes = sorted(int(s) for s in args.sizes.split(","))
+    rnd = random.Random(args.seed)
+    texts = [random_text(rnd, rnd.randint(0, 120)) for _ in range(args.fuzz)]
+    texts += [worst_case(prefix, unit, suffix, size) for _, prefix, unit, suffix in WORST_CASES
+              for size in (1, 20, 200)]
+    failures = fuzz(texts)
+    print(f"fuzz: {len(texts)} texts, {failures} mismatches with re")
+
+    print(f"\n{'label':<14} {'exponent':>8} {f'ms @ {sizes[-1]:,}':>12}  worst input")
+    slow = []
+    for rule in PIIModel.SCANNER.rules:
+        exponent, ms, name = growth(rule, sizes, args.repeat, args.legacy)
+        flag = ""
+        if exponent > args.max_exponent:
+            slow.append(rule[0])
+            flag = "  ⚠️ superlinear"
+        print(f"{rule[0]:<14} {exponent:>8.2f} {ms:>12.2f}  {name}{flag}")
+
+    if failures or slow:
+        sys.exit(1)
+    print("✅ Same matches as re, linear on every worst-case input")
+
+
+if __name__ == "__main__":
+    main()
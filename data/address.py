@@ -42,29 +42,29 @@ UNITS = ["#01-102", "#05-14", "#03-06", "#08-04", "#29-01", "1st Storey", "2nd S
 # -----------------------------
 # Helper function
 # -----------------------------
-def random_address():
-    context = random.choice(CONTEXTS)
-    prefix = random.choice(PREFIXES + [""])
-    street = random.choice(STREETS)
-    suffix = random.choice(SUFFIXES + [""])
+def random_address(rng=random):
+    context = rng.choice(CONTEXTS)
+    prefix = rng.choice(PREFIXES + [""])
+    street = rng.choice(STREETS)
+    suffix = rng.choice(SUFFIXES + [""])
     
     # Add random street number
-    street_number = str(random.randint(1, 999)) if random.random() < 0.7 else ""
+    street_number = str(rng.randint(1, 999)) if rng.random() < 0.7 else ""
 
     # Combine street name
     street_name = " ".join([p for p in [street_number, prefix, street, suffix] if p])
 
     # Maybe add unit number (position randomized)
-    unit = random.choice(UNITS)
-    if random.random() < 0.5:
+    unit = rng.choice(UNITS)
+    if rng.random() < 0.5:
         street_name = f"{unit} {street_name}"
     else:
         street_name = f"{street_name} {unit}"
 
     # Maybe add Singapore + postal code
-    if random.random() < 0.7:
-        postal_code = f"Singapore {random.randint(100000, 829999)}"
-        if random.random() < 0.5:
+    if rng.random() < 0.7:
+        postal_code = f"Singapore {rng.randint(100000, 829999)}"
+        if rng.random() < 0.5:
             street_name = f"{street_name} {postal_code}"
         else:
             street_name = f"{postal_code} {street_name}"
@@ -92,18 +92,23 @@ def label_address(text, address):
 # -----------------------------
 # Generate dataset
 # -----------------------------
-data = []
-for _ in range(NUM_SAMPLES):
-    text, address = random_address()
-    label = label_address(text, address)
-    data.append([text, label])
+def generate(num_samples=NUM_SAMPLES, rng=random):
+    """Returns ``[text, label]`` rows drawn with ``rng``."""
+    data = []
+    for _ in range(num_samples):
+        text, address = random_address(rng)
+        label = label_address(text, address)
+        data.append([text, label])
+    return data
 
 # -----------------------------
 # Save to CSV
 # -----------------------------
-with open(OUTPUT_CSV, "w", newline="", encoding="utf-8") as f:
-    writer = csv.writer(f)
-    writer.writerow(["text","label"])
-    writer.writerows(data)
+if __name__ == "__main__":
+    data = generate()
+    with open(OUTPUT_CSV, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["text","label"])
+        writer.writerows(data)
 
-print(f"✅ Generated {NUM_SAMPLES} synthetic address samples at {OUTPUT_CSV}")
+    print(f"✅ Generated {NUM_SAMPLES} synthetic address samples at {OUTPUT_CSV}")
@@ -14,7 +14,7 @@ BANKS = {
     "FEB": 10,
     "POSBank": 9,
     "OCBC": 7,
-    "HSBC": random.choice([7,8,9,10,11,12]),  # vary digits
+    "HSBC": [7,8,9,10,11,12],  # vary digits
     "Standard Chartered": 10
 }
 
@@ -35,15 +35,17 @@ TEMPLATES = [
 # -----------------------------
 # Helper functions
 # -----------------------------
-def random_bank_account(bank_name):
+def random_bank_account(bank_name, rng=random):
     digits = BANKS[bank_name]
+    if isinstance(digits, list):
+        digits = rng.choice(digits)
     # Drop first 3 digits for OCBC/HSBC branch code simulation
     if bank_name in ["OCBC", "HSBC"]:
-        branch_code = "".join(random.choices("0123456789", k=3))
-        main_digits = "".join(random.choices("0123456789", k=digits))
+        branch_code = "".join(rng.choices("0123456789", k=3))
+        main_digits = "".join(rng.choices("0123456789", k=digits))
         account_number = main_digits  # drop branch code
     else:
-        account_number = "".join(random.choices("0123456789", k=digits))
+        account_number = "".join(rng.choices("0123456789", k=digits))
     return account_number
 
 def label_account(text, account_str):
@@ -58,22 +60,27 @@ def label_account(text, account_str):
 # -----------------------------
 # Generate dataset
 # -----------------------------
-data = []
+def generate(num_samples=NUM_SAMPLES, rng=random):
+    """Returns ``[text, label]`` rows drawn with ``rng``."""
+    data = []
 
-for _ in range(NUM_SAMPLES):
-    template = random.choice(TEMPLATES)
-    bank = random.choice(list(BANKS.keys()))
-    account_str = random_bank_account(bank)
-    text = template.format(account=account_str)
-    label = label_account(text, account_str)
-    data.append([text, label])
+    for _ in range(num_samples):
+        template = rng.choice(TEMPLATES)
+        bank = rng.choice(list(BANKS.keys()))
+        account_str = random_bank_account(bank, rng)
+        text = template.format(account=account_str)
+        label = label_account(text, account_str)
+        data.append([text, label])
+    return data
 
 # -----------------------------
 # Save to CSV
 # -----------------------------
-with open(OUTPUT_CSV, "w", newline="", encoding="utf-8") as f:
-    writer = csv.writer(f)
-    writer.writerow(["text", "label"])
-    writer.writerows(data)
+if __name__ == "__main__":
+    data = generate()
+    with open(OUTPUT_CSV, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["text", "label"])
+        writer.writerows(data)
 
-print(f"✅ Generated {NUM_SAMPLES} synthetic BANK ACCOUNT sentences at {OUTPUT_CSV}")
+    print(f"✅ Generated {NUM_SAMPLES} synthetic BANK ACCOUNT sentences at {OUTPUT_CSV}")
@@ -47,15 +47,15 @@ DATE_FORMATS = [
 # -----------------------------
 # Helper functions
 # -----------------------------
-def random_date(start_year=1990, end_year=2030):
+def random_date(start_year=1990, end_year=2030, rng=random):
     start = datetime(start_year, 1, 1)
     end = datetime(end_year, 12, 31)
     delta = end - start
-    random_days = random.randint(0, delta.days)
+    random_days = rng.randint(0, delta.days)
     return start + timedelta(days=random_days)
 
-def format_date(dt):
-    fmt = random.choice(DATE_FORMATS)
+def format_date(dt, rng=random):
+    fmt = rng.choice(DATE_FORMATS)
     return dt.strftime(fmt)
 
 def label_date(text):
@@ -81,22 +81,27 @@ def label_date(text):
 # -----------------------------
 # Generate dataset
 # -----------------------------
-data = []
+def generate(num_samples=NUM_SAMPLES, rng=random):
+    """Returns ``[text, label]`` rows drawn with ``rng``."""
+    data = []
 
-for _ in range(NUM_SAMPLES):
-    template = random.choice(TEMPLATES)
-    dt = random_date()
-    date_str = format_date(dt)
-    text = template.format(date=date_str)
-    label = label_date(text)
-    data.append([text, label])
+    for _ in range(num_samples):
+        template = rng.choice(TEMPLATES)
+        dt = random_date(rng=rng)
+        date_str = format_date(dt, rng)
+        text = template.format(date=date_str)
+        label = label_date(text)
+        data.append([text, label])
+    return data
 
 # -----------------------------
 # Save to CSV
 # -----------------------------
-with open(OUTPUT_CSV, "w", newline="", encoding="utf-8") as f:
-    writer = csv.writer(f)
-    writer.writerow(["text","label"])
-    writer.writerows(data)
+if __name__ == "__main__":
+    data = generate()
+    with open(OUTPUT_CSV, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["text","label"])
+        writer.writerows(data)
 
-print(f"✅ Generated {NUM_SAMPLES} synthetic date sentences at {OUTPUT_CSV}")
+    print(f"✅ Generated {NUM_SAMPLES} synthetic date sentences at {OUTPUT_CSV}")
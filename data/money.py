@@ -25,21 +25,21 @@ TEMPLATES = [
 MONEY_SYMBOLS = ["$", "USD", "SGD", "S$", "£", "€", "¥"]
 MONEY_WORDS = ["dollars", "bucks", "pounds", "euros", "yen", "rupees"]
 
-def random_money():
+def random_money(rng=random):
     """Generate random money string."""
-    amount = random.randint(1, 5000)
-    fmt_type = random.choice(["symbol", "word", "mixed"])
+    amount = rng.randint(1, 5000)
+    fmt_type = rng.choice(["symbol", "word", "mixed"])
 
     if fmt_type == "symbol":
-        symbol = random.choice(MONEY_SYMBOLS)
+        symbol = rng.choice(MONEY_SYMBOLS)
         return f"{symbol}{amount}" if symbol in ["$", "£", "€", "¥", "S$"] else f"{symbol} {amount}"
 
     elif fmt_type == "word":
-        word = random.choice(MONEY_WORDS)
+        word = rng.choice(MONEY_WORDS)
         return f"{amount} {word}"
 
     else:  # mixed
-        return f"${amount} {random.choice(MONEY_WORDS)}"
+        return f"${amount} {rng.choice(MONEY_WORDS)}"
 
 def label_money(text, money_str):
     """Generate BIO labels for sentence with money entity."""
@@ -60,21 +60,26 @@ def label_money(text, money_str):
 # -----------------------------
 # Generate dataset
 # -----------------------------
-data = []
+def generate(num_samples=NUM_SAMPLES, rng=random):
+    """Returns ``[text, label]`` rows drawn with ``rng``."""
+    data = []
 
-for _ in range(NUM_SAMPLES):
-    template = random.choice(TEMPLATES)
-    money_str = random_money()
-    text = template.format(money=money_str)
-    label = label_money(text, money_str)
-    data.append([text, label])
+    for _ in range(num_samples):
+        template = rng.choice(TEMPLATES)
+        money_str = random_money(rng)
+        text = template.format(money=money_str)
+        label = label_money(text, money_str)
+        data.append([text, label])
+    return data
 
 # -----------------------------
 # Save to CSV
 # -----------------------------
-with open(OUTPUT_CSV, "w", newline="", encoding="utf-8") as f:
-    writer = csv.writer(f)
-    writer.writerow(["text", "label"])
-    writer.writerows(data)
+if __name__ == "__main__":
+    data = generate()
+    with open(OUTPUT_CSV, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["text", "label"])
+        writer.writerows(data)
 
-print(f"✅ Generated {NUM_SAMPLES} synthetic MONEY sentences at {OUTPUT_CSV}")
+    print(f"✅ Generated {NUM_SAMPLES} synthetic MONEY sentences at {OUTPUT_CSV}")
@@ -0,0 +1,143 @@
+import pytest
+
+from backend import config
+from backend.registry import ModelRegistry
+
+
+class StubSlot:
+    def __init__(self, state="ready", error=None):
+        self.state, self.error = state, error
+
+
+class StubModel:
+    def __init__(self, path=None, reuse=None, broken=False):
+        self.path, self.reuse = path, reuse
+        self.slots = {"ner": StubSlot(), "distil": StubSlot("failed", "bad weights") if broken else StubSlot()}
+
+
+class StubFactory:
+    """Builds a StubModel per call; versions named "broken*" fail to load
+    their fine-tuned slot, the way a PIIModel marks an optional slot."""
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, reuse=None, lazy=None, distil_model=None, student_model=None):
+        path = distil_model or student_model
+        self.calls.append(path)
+        broken = path is not None and path.rsplit("/", 1)[-1].startswith("broken")
+        return StubModel(path, reuse, broken)
+
+
+@pytest.fixture
+def registry(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "STUDENT_MODEL", None)
+    for version in ("v1", "v2", "v3", "broken"):
+        (tmp_path / version).mkdir()
+    return ModelRegistry(str(tmp_path), StubFactory())
+
+
+def test_initial_starts_with_default(registry):
+    model = registry.initial()
+    assert registry.active == ModelRegistry.DEFAULT
+    assert model.path is None
+    assert registry.versions() == ["broken", "v1", "v2", "v3"]
+
+
+def test_initial_reads_active_file(registry, tmp_path):
+    (tmp_path / "ACTIVE").write_text("v2\n")
+    assert registry.initial().path == str(tmp_path / "v2")
+    assert registry.active == "v2"
+
+
+def test_initial_falls_back_when_active_version_is_gone(registry, tmp_path):
+    (tmp_path / "ACTIVE").write_text("v9\n")
+    registry.initial()
+    assert registry.active == ModelRegistry.DEFAULT
+
+
+def test_load_builds_once_and_shares_the_active_model(registry):
+    default = registry.initial()
+    model = registry.load("v1")
+    assert model.reuse is default
+    assert registry.load("v1") is model
+    assert registry.factory.calls.count(model.path) == 1
+    assert registry.status()["loaded"] == ["default", "v1"]
+
+
+def test_load_rejects_unknown_and_broken_versions(registry):
+    registry.initial()
+    with pytest.raises(KeyError):
+        registry.load("v9")
+    with pytest.raises(KeyError):
+        registry.load("../v1")
+    with pytest.raises(RuntimeError, match="bad weights"):
+        registry.load("broken")
+    assert "broken" not in registry.models
+    assert registry.status()["loading"]["broken"].startswith("failed")
+    with pytest.raises(LookupError):
+        registry.activate("broken")
+
+
+def test_activate_and_rollback(registry, tmp_path):
+    registry.initial()
+    with pytest.raises(LookupError):
+        registry.activate("v1")
+    v1 = registry.load("v1")
+    assert registry.activate("v1") is v1
+    assert (registry.active, registry.previous) == ("v1", "default")
+    assert (tmp_path / "ACTIVE").read_text() == "v1\n"
+
+    default = registry.rollback()
+    assert default is registry.models["default"]
+    assert (registry.active, registry.previous) == ("default", "v1")
+    assert (tmp_path / "ACTIVE").read_text() == "default\n"
+
+
+def test_rollback_without_previous_version(registry):
+    registry.initial()
+    with pytest.raises(LookupError):
+        registry.rollback()
+
+
+def test_canary_routing(registry, monkeypatch):
+    registry.initial()
+    with pytest.raises(LookupError):
+        registry.set_canary("v1", 10)
+    registry.load("v1")
+    registry.set_canary("v1", 25)
+    monkeypatch.setattr("backend.registry.random.random", lambda: 0.2)
+    assert registry.route() == "v1"
+    monkeypatch.setattr("backend.registry.random.random", lambda: 0.3)
+    assert registry.route() is None
+
+    # Promoting the canary ends it
+    registry.activate("v1")
+    assert (registry.canary, registry.canary_percent) == (None, 0.0)
+    assert registry.route() is None
+
+
+def test_canary_percent_is_capped_and_zero_turns_it_off(registry):
+    registry.initial()
+    registry.load("v1")
+    registry.set_canary("v1", 250)
+    assert registry.canary_percent == 100.0
+    registry.set_canary("v1", 0)
+    assert registry.canary is None
+
+
+def test_evicts_all_but_active_previous_and_canary(registry):
+    registry.initial()
+    registry.load("v1")
+    registry.activate("v1")
+    registry.load("v2")
+    registry.activate("v2")
+    assert sorted(registry.models) == ["v1", "v2"]
+    registry.load("v3")
+    registry.set_canary("v3", 5)
+    assert sorted(registry.models) == ["v1", "v2", "v3"]
+
+    # A request routed to a version dropped since gets the active model
+    registry.set_canary(None, 0)
+    assert sorted(registry.models) == ["v1", "v2"]
+    assert registry.get("v3") is registry.models["v2"]